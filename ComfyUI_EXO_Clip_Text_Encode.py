@@ -30,20 +30,41 @@ EXO Clip Text Encode 👑
 Features:
 - Dual Prompt Handling: This node processes both positive and negative text prompts.
 - Encoding: Utilizes CLIP models to convert text inputs into conditioning tensors.
+- Batched Encoding: The positive and negative prompts are encoded together in one forward pass of each text encoder.
 - UTF-8 Compatibility: Ensures that text inputs are properly encoded in UTF-8.
+- List Mode: The EXO Clip Text Encode List node takes lists of prompts (e.g. from a batch prompt generator) and encodes them in a few padded batches, grouped by token chunk count, instead of one forward pass per prompt.
+- Conditioning Cache: Texts encoded before with the same CLIP model (including LoRA patches) are reused instead of encoded again, from memory or optionally from disk, in full precision, so a cached encoding is identical to a fresh one.
+- Chunk Cache: Long prompts are cached per 77-token chunk, so editing the end of a prompt only re-encodes the chunks that changed.
 
 Inputs:
 - Clip_Input: Connect this to the output of a loaded CLIP model.
 - Positive_Text: A multiline string input for positive prompts.
 - Negative_Text: A multiline string input for negative prompts.
+- Cache_Mode: (Optional) Disabled, Memory (default) or Memory + Disk, which also keeps encodings in clip_cache/ across restarts.
+- Max_Batch_Size: (Optional, List node only) Maximum number of token chunks encoded in one forward pass.
 
 Outputs:
 - Clip_Cond_Positive: The positive conditioning tensor.
 - Clip_Cond_Negative: The negative conditioning tensor.
 - Positive_Text: The original positive text prompt, available for downstream use.
 - Negative_Text: The original negative text prompt, available for downstream use.
+- The List node outputs one conditioning and text per prompt as lists.
 """
 
+from server import PromptServer
+from aiohttp import web
+from .clip_conditioning_cache import conditioning_cache, model_fingerprint, get_stats
+from .clip_batch_encode import encode_token_sets, DEFAULT_MAX_BATCH_ROWS
+from .functions import ensure_utf8, list_item
+
+# Conditioning cache modes; "Memory + Disk" also keeps entries in clip_cache/ across restarts
+CACHE_MODES = ["Disabled", "Memory", "Memory + Disk"]
+
+@PromptServer.instance.routes.get("/comfyui_exo/clip-cache/stats")
+async def get_cache_stats(request):
+    """API endpoint to get the conditioning cache hit/miss counters."""
+    return web.json_response(get_stats())
+
 class ComfyUI_EXO_Clip_Text_Encode:
     
     def __init__(self):
@@ -66,6 +87,12 @@ class ComfyUI_EXO_Clip_Text_Encode:
                     "forceInput": True, 
                     "tooltip": "Connect this input to another nodes text (STRING) output."
                 }),
+            },
+            "optional": {
+                "Cache_Mode": (CACHE_MODES, {
+                    "default": "Memory",
+                    "tooltip": "Reuse encodings of texts seen before with the same CLIP model.   Memory + Disk also keeps them across restarts."
+                }),
             }
         }
 
@@ -80,7 +107,7 @@ class ComfyUI_EXO_Clip_Text_Encode:
     FUNCTION = "encode_text"
     CATEGORY = "Custom EXO Nodes"
 
-    def encode_text(self, Clip_Input, Positive_Text, Negative_Text):
+    def encode_text(self, Clip_Input, Positive_Text, Negative_Text, Cache_Mode="Memory"):
         """
         Encodes positive and negative text prompts into CLIP embeddings.
         
@@ -88,28 +115,16 @@ class ComfyUI_EXO_Clip_Text_Encode:
             Clip_Input: The CLIP model used for encoding
             Positive_Text (str): The positive prompt text
             Negative_Text (str): The negative prompt text
+            Cache_Mode (str): Disabled, Memory or Memory + Disk
             
         Returns:
             tuple: (positive_conditioning, negative_conditioning, positive_text, negative_text)
         """
         # Ensure proper UTF-8 encoding to handle special characters
-        def ensure_utf8(text):
-            if isinstance(text, bytes):
-                return text.decode('utf-8')
-            elif isinstance(text, str):
-                return text.encode('utf-8').decode('utf-8')
-            return text
-
         Positive_Text = ensure_utf8(Positive_Text)
         Negative_Text = ensure_utf8(Negative_Text)
 
-        # Convert text to tokens for CLIP processing
-        positive_tokens = Clip_Input.tokenize(Positive_Text)
-        negative_tokens = Clip_Input.tokenize(Negative_Text)
-
-        # Generate embeddings from tokens
-        positive_output = Clip_Input.encode_from_tokens(positive_tokens, return_pooled=True, return_dict=True)
-        negative_output = Clip_Input.encode_from_tokens(negative_tokens, return_pooled=True, return_dict=True)
+        positive_output, negative_output = self.encode_texts(Clip_Input, [Positive_Text, Negative_Text], Cache_Mode)
 
         # Extract the primary conditioning tensors
         cond_positive = positive_output.pop("cond")
@@ -122,11 +137,97 @@ class ComfyUI_EXO_Clip_Text_Encode:
             Negative_Text
         )
 
+    def encode_texts(self, Clip_Input, texts, Cache_Mode, max_batch_rows=DEFAULT_MAX_BATCH_ROWS):
+        """
+        Encodes texts, using the conditioning cache unless it is disabled.
+        Texts that aren't cached are encoded together with one forward pass per text encoder.
+        
+        Returns:
+            list: One encoder output dict per text with "cond", "pooled_output" and any model specific entries
+        """
+        # Encodings scheduled with clip hooks differ per step and are never cached
+        fingerprint = None
+        if Cache_Mode != "Disabled" and not getattr(Clip_Input, "use_clip_schedule", False):
+            fingerprint = model_fingerprint(Clip_Input)
+        use_disk = Cache_Mode == "Memory + Disk"
+
+        outputs = [None] * len(texts)
+        missing = {}
+        for index, text in enumerate(texts):
+            if fingerprint is not None:
+                outputs[index] = conditioning_cache.get((fingerprint, text), use_disk)
+            if outputs[index] is None:
+                # The same text is only encoded once
+                missing.setdefault(text, []).append(index)
+
+        # Convert text to tokens for CLIP processing and generate embeddings from tokens
+        token_sets = [Clip_Input.tokenize(text) for text in missing]
+        for (text, indexes), output in zip(missing.items(), encode_token_sets(Clip_Input, token_sets, max_batch_rows, fingerprint)):
+            if fingerprint is not None:
+                conditioning_cache.put((fingerprint, text), output, use_disk)
+            outputs[indexes[0]] = output
+            for index in indexes[1:]:
+                outputs[index] = dict(output)
+        return outputs
+
+class ComfyUI_EXO_Clip_Text_Encode_List(ComfyUI_EXO_Clip_Text_Encode):
+    """List mode variant: encodes every prompt of a list input in batched forward passes."""
+
+    @classmethod
+    def INPUT_TYPES(s):
+        input_types = super().INPUT_TYPES()
+        input_types["optional"]["Max_Batch_Size"] = ("INT", {
+            "default": DEFAULT_MAX_BATCH_ROWS,
+            "min": 1,
+            "max": 256,
+            "tooltip": "Maximum number of token chunks encoded in one forward pass.   Lower it if encoding runs out of memory."
+        })
+        return input_types
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True, True, True)
+
+    def encode_text(self, Clip_Input, Positive_Text, Negative_Text, Cache_Mode=None, Max_Batch_Size=None):
+        """
+        Encodes lists of positive and negative text prompts into CLIP embeddings.
+        
+        Args:
+            Clip_Input (list): The CLIP model used for encoding
+            Positive_Text (list): The positive prompt texts
+            Negative_Text (list): The negative prompt texts
+            Cache_Mode (list): Disabled, Memory or Memory + Disk
+            Max_Batch_Size (list): Maximum number of token chunks per forward pass
+            
+        Returns:
+            tuple: Lists of (positive_conditioning, negative_conditioning, positive_text, negative_text)
+        """
+        # Shorter input lists repeat their last value, like ComfyUI does for list inputs
+        count = max(len(Positive_Text), len(Negative_Text))
+        positive_texts = [ensure_utf8(list_item(Positive_Text, index, "")) for index in range(count)]
+        negative_texts = [ensure_utf8(list_item(Negative_Text, index, "")) for index in range(count)]
+
+        # Every prompt is encoded in one go; repeated texts (often the negative prompt) are encoded once
+        outputs = self.encode_texts(
+            list_item(Clip_Input, 0, None),
+            positive_texts + negative_texts,
+            list_item(Cache_Mode, 0, "Memory"),
+            list_item(Max_Batch_Size, 0, DEFAULT_MAX_BATCH_ROWS),
+        )
+
+        conditionings = []
+        for output in outputs:
+            cond = output.pop("cond")
+            conditionings.append([[cond, output]])
+
+        return (conditionings[:count], conditionings[count:], positive_texts, negative_texts)
+
 # Register the node with ComfyUI
 NODE_CLASS_MAPPINGS = {
     "ComfyUI_EXO_Clip_Text_Encode": ComfyUI_EXO_Clip_Text_Encode,
+    "ComfyUI_EXO_Clip_Text_Encode_List": ComfyUI_EXO_Clip_Text_Encode_List,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "ComfyUI_EXO_Clip_Text_Encode": "ComfyUI EXO Clip Text Encode 👑",
+    "ComfyUI_EXO_Clip_Text_Encode_List": "ComfyUI EXO Clip Text Encode List 👑",
 }
\ No newline at end of file
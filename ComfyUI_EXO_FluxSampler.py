@@ -30,16 +30,18 @@ The ComfyUI EXO FluxSampler node is an advanced sampling node designed for Comfy
 
 Features:
 - Customizable Sampling: Including noise seed, increment value, sampler name, scheduler, and more.
-- Model Sampling: Utilizes a custom ModelSamplingFlux logic.
+- Sigma Cache: Sigma schedules are cached, and with denoise below 1 only the kept steps are computed where the scheduler allows it.
+- Model Sampling: Utilizes a custom ModelSamplingFlux logic, shared with the FluxSampler Mini node. Patched models and sampling objects are reused when running again at the same resolution.
 - Noise Generation: Includes a built-in noise generator.
 - Guidance Integration: Supports conditioning guidance.
+- Sweep Mode: Renders a batch of seeds (noise_seed + k * increment_value), optionally crossed with several guidance values, in one sampler pass instead of one queued job per image.
 
 Inputs:
 - Model: The model to be used for sampling.
 - Conditioning: The conditioning tensor for guiding the sampling process.
 - Width and Height: Dimensions for the output image.
 - Noise_Seed: Seed for noise generation, ensuring reproducibility.
-- Increment_Value: Increment value for sampling adjustments.
+- Increment_Value: Seed step between the images of a sweep batch.
 - Sampler_Name: Chooses the sampler algorithm.
 - Scheduler: Selects the scheduling method for sigma generation.
 - Steps: Number of steps for the sampling process.
@@ -47,6 +49,9 @@ Inputs:
 - Max_Shift and Base_Shift: Parameters for controlling the sampling shift.
 - Guidance: Guidance factor for conditioning adjustments.
 - Negative_Conditioning (optional): Additional conditioning for negative guidance.
+- Latent_In (optional): An existing latent to sample; when connected no empty latent is allocated. In sweep mode a single latent is repeated to the sweep batch, and any other batch size must match it.
+- Sweep_Count (optional): Number of seeds in the sweep batch (1 disables the sweep).
+- Sweep_Guidance (optional): Comma separated guidance values to cross with every seed, e.g. "2.0, 3.5". Applies through Model_Out and Guider.
 
 Outputs:
 - Model_Out: The processed model with applied sampling.
@@ -54,8 +59,8 @@ Outputs:
 - Sampler: The sampler object used for processing.
 - Sigmas: The computed sigmas for the sampling process.
 - Seed: The seed dictionary for noise generation.
-- Latent: The generated latent image tensor.
-- Guider: The guidance object for conditioning.
+- Latent: The generated latent image tensor, or Latent_In when connected (Sweep_Count x guidance values images in sweep mode, ordered seed by seed).
+- Guider: A basic guider built from Model_Out and Conditioning_Out, so the sampling patch and the guidance sweep also apply when sampling with it.
 - Conditioning_Out: The adjusted conditioning tensor with applied guidance.
 """
 
@@ -63,9 +68,10 @@ import comfy.samplers
 import torch
 import comfy.sample
 import random
-import comfy.model_sampling
 import node_helpers
-from nodes import EmptyLatentImage
+from nodes import EmptyLatentImage, RepeatLatentBatch
+from .flux_sampling import patch_model, calculate_sigmas, apply_guidance_sweep
+from .flux_noise import NoiseGenerator
 
 class ComfyUI_EXO_FluxSampler:
     @classmethod
@@ -92,6 +98,11 @@ class ComfyUI_EXO_FluxSampler:
             },
             "optional": {
                 "neg_cond_in": ("CONDITIONING", {"tooltip": "Connect this to a negative conditioning input."}),
+                "latent_in": ("LATENT", {"tooltip": "Connect this to a node that has a latent output.   When connected, no empty latent is created."}),
+                "sweep_count": ("INT", {"default": 1, "min": 1, "max": 64, "step": 1,
+                                        "tooltip": "Number of seeds rendered in one batch (noise_seed + k * increment_value).   1 disables the sweep."}),
+                "sweep_guidance": ("STRING", {"default": "", "multiline": False,
+                                              "tooltip": "Comma separated guidance values crossed with every seed, e.g. 2.0, 3.5.   Leave empty to use guidance."}),
             }
         }
     
@@ -125,9 +136,27 @@ class ComfyUI_EXO_FluxSampler:
         processed_negative = node_helpers.conditioning_set_values(neg_cond_in, {"scale": 1.0})
         return processed_negative
 
+    def parse_guidance_values(self, sweep_guidance):
+        """
+        Parse the comma separated sweep guidance values, skipping anything that isn't a number.
+        
+        Returns:
+            list: The guidance values, empty when no sweep guidance is set
+        """
+        values = []
+        for value in (sweep_guidance or "").split(","):
+            value = value.strip()
+            if not value:
+                continue
+            try:
+                values.append(float(value))
+            except ValueError:
+                print(f"\033[93mIgnoring sweep guidance value '{value}': not a number.\033[0m")
+        return values
+
     def generate(self, model, pos_cond_in, width, height, noise_seed, increment_value, 
                 sampler_name, scheduler, steps, denoise, max_shift, base_shift, guidance,
-                neg_cond_in=None):
+                neg_cond_in=None, sweep_count=1, sweep_guidance="", latent_in=None):
         # Handle edge cases
         noise_seed = max(0, noise_seed)
         increment_value = max(1, increment_value)
@@ -135,74 +164,60 @@ class ComfyUI_EXO_FluxSampler:
         # Use provided negative conditioning or default to positive conditioning
         negative = neg_cond_in if neg_cond_in is not None else pos_cond_in
 
-        # Model Sampling Flux logic
-        m = model.clone()
-        x1 = 256
-        x2 = 4096
-        mm = (max_shift - base_shift) / (x2 - x1)
-        b = base_shift - mm * x1
-        shift = (width * height / (8 * 8 * 2 * 2)) * mm + b
-
-        # Set up model sampling
-        sampling_base = comfy.model_sampling.ModelSamplingFlux
-        sampling_type = comfy.model_sampling.CONST
-
-        class ModelSamplingAdvanced(sampling_base, sampling_type):
-            pass
-
-        model_sampling = ModelSamplingAdvanced(model.model.model_config)
-        model_sampling.set_parameters(shift=shift)
-        m.add_object_patch("model_sampling", model_sampling)
-
-        # Generate sigmas using scheduler
-        total_steps = steps
-        if denoise < 1.0:
-            if denoise <= 0.0:
-                sigmas = torch.FloatTensor([])
-            else:
-                total_steps = int(steps/denoise)
-        
-        sigmas = comfy.samplers.calculate_sigmas(
-            model.get_model_object("model_sampling"), 
-            scheduler, 
-            total_steps
-        ).cpu()
-        
-        if denoise < 1.0:
-            sigmas = sigmas[-(steps + 1):]
+        # Model Sampling Flux logic (patched clones are reused for the same model and resolution)
+        m = patch_model(model, width, height, max_shift, base_shift)
+
+        # Generate sigmas using scheduler (cached; computed from the unpatched model's sampling)
+        sigmas = calculate_sigmas(model.get_model_object("model_sampling"), scheduler, steps, denoise)
 
         # Create sampler object
         sampler = comfy.samplers.sampler_object(sampler_name)
 
-        # Create noise generator
-        class NoiseGenerator:
-            def __init__(self, seed):
-                self.seed = seed
-            
-            def generate_noise(self, input_latent):
-                latent_image = input_latent["samples"]
-                batch_inds = input_latent["batch_index"] if "batch_index" in input_latent else None
-                return comfy.sample.prepare_noise(latent_image, self.seed, batch_inds)
+        # Sweep mode: every seed is crossed with every guidance value, seed by seed
+        sweep_count = max(1, sweep_count)
+        guidance_values = self.parse_guidance_values(sweep_guidance)
+        batch_size = sweep_count * max(1, len(guidance_values))
+
+        # Create noise generator (one seed per sweep image, all crossed images of a seed share it)
+        if batch_size > 1:
+            noise = NoiseGenerator(noise_seed, increment_value, group_size=max(1, len(guidance_values)))
+        else:
+            noise = NoiseGenerator(noise_seed)
 
-        noise = NoiseGenerator(noise_seed)
+        if len(guidance_values) > 1:
+            m = apply_guidance_sweep(m, guidance_values)
+        if guidance_values:
+            guidance = guidance_values[0]
 
         # Create seed dictionary for SEED type output
         seed_dict = {"seed": noise_seed}
 
-        # Create latent using EmptyLatentImage
-        latent = EmptyLatentImage().generate(width, height, batch_size=1)[0]
+        # Use the connected latent, or create one using EmptyLatentImage
+        if latent_in is not None:
+            latent = latent_in
+            latent_batch = latent["samples"].shape[0]
+            if batch_size > 1 and latent_batch != batch_size:
+                # The sweep needs one latent per seed and guidance value
+                if latent_batch != 1:
+                    raise ValueError(f"latent_in has a batch of {latent_batch}, but the sweep renders {batch_size} images "
+                                     f"(sweep_count {sweep_count} x {max(1, len(guidance_values))} guidance values). "
+                                     f"Connect a single latent or a batch of {batch_size}.")
+                latent = RepeatLatentBatch().repeat(latent, batch_size)[0]
+        else:
+            latent = EmptyLatentImage().generate(width, height, batch_size=batch_size)[0]
 
         # Create basic guider
         class Guider_Basic(comfy.samplers.CFGGuider):
             def set_conds(self, positive):
                 self.inner_set_conds({"positive": positive})
 
-        guider = Guider_Basic(model)
-        guider.set_conds(pos_cond_in)
-
         # Apply guidance to conditioning (from FluxGuidance)
         conditioning_out = node_helpers.conditioning_set_values(pos_cond_in, {"guidance": guidance})
 
+        # The guider samples the patched (and swept) model with the conditioning that is output
+        guider = Guider_Basic(m)
+        guider.set_conds(conditioning_out)
+
         # Process negative conditioning
         neg_cond_out = self.neg_out_cond(neg_cond_in)
 
@@ -29,7 +29,7 @@ EXO FluxSampler Mini 👑
 The ComfyUI EXO FluxSampler Mini node is an sampling node designed for ComfyUI. It provides flexible sampling capabilities, allowing for control over model sampling.
 
 Features:
-- Model Sampling: Utilizes a custom ModelSamplingFlux logic.
+- Model Sampling: Utilizes a custom ModelSamplingFlux logic, shared with the FluxSampler node. Patched models and sampling objects are reused when running again at the same resolution.
 
 Inputs:
 - Model: The model to be used for sampling.
@@ -43,7 +43,7 @@ Outputs:
 
 
 import nodes
-import comfy.model_sampling
+from .flux_sampling import patch_model
 
 class ComfyUI_EXO_FluxSamplerMini:
     NAME = "ComfyUI EXO FluxSampler Mini 👑"
@@ -91,30 +91,8 @@ class ComfyUI_EXO_FluxSamplerMini:
         Returns:
             tuple: Contains the patched model
         """
-        m = model.clone()
-
-        # Constants from original implementation
-        x1 = 256
-        x2 = 4096
-        
-        # Calculate shift using the same formula as original
-        mm = (max_shift - base_shift) / (x2 - x1)
-        b = base_shift - mm * x1
-        shift = (width * height / (8 * 8 * 2 * 2)) * mm + b
-
-        # Set up the sampling classes
-        sampling_base = comfy.model_sampling.ModelSamplingFlux
-        sampling_type = comfy.model_sampling.CONST
-
-        class ModelSamplingAdvanced(sampling_base, sampling_type):
-            pass
-
-        # Create and configure the model sampling
-        model_sampling = ModelSamplingAdvanced(model.model.model_config)
-        model_sampling.set_parameters(shift=shift)
-        
-        # Add the sampling patch to the model
-        m.add_object_patch("model_sampling", model_sampling)
+        # Clone the model and add the sampling patch (reused for the same model and resolution)
+        m = patch_model(model, width, height, max_shift, base_shift)
         
         return (m,)
 
@@ -37,8 +37,19 @@ Modes:
 Features:
 - Multiple resampling methods (lanczos, nearest, bilinear, bicubic)
 - Supersampling anti-aliasing option for higher quality results
+- Memory-bounded anti-aliasing: pyramid (supersamples at the largest scale up to 8x that fits the memory cap, then halves step by step) and tiled (the 8x supersample computed in strips that fit the memory cap, written straight into the output)
 - Maintains proper tensor format for ComfyUI compatibility
 - Configurable scale factors via external JSON configuration
+- Batch support: every image of a batch is rescaled, not only the first
+- No-op short-circuit: when the target size equals the image size and Supersample is false, the image is passed through without any conversion
+- uint8 PIL path: the batch is converted to 8-bit once, stays 8-bit through PIL, and is converted back to float once
+- Real progress in every mode: the progress bar advances as resizes, strips and frames actually finish, and a long rescale stops at the next one when the queue is interrupted
+- Streaming: long frame sequences (e.g. video) are rescaled in fixed-size windows into a preallocated output tensor, or a memory-mapped file in the ComfyUI temp directory, so memory use is bounded by the window size instead of the sequence length
+- Parallel PIL resizing: the frames of a batch are resized on a thread pool (PIL releases the GIL while resizing) into one preallocated tensor
+- Torch backend: resizes the whole batch in one antialiased torch interpolate call on the tensor, without converting to PIL (Lanczos uses antialiased bicubic, as torch has no Lanczos filter)
+- Separable backend: resizes the whole batch with two passes of matrix multiplications using PIL's Lanczos, bicubic, bilinear and nearest weights, computed once per source size, target size and filter and kept in a cache
+- OpenCV backend: resizes frames with cv2.resize and the matching OpenCV filter when opencv-python is installed (no antialiasing when shrinking)
+- Auto backend (opt-in): the first time a resampling method is used for upscaling or downscaling with a Supersample mode, the installed backends that support both are benchmarked on a high-detail image and the fastest one within one 8-bit level of PIL on every pixel is used from then on (saved in rescale_backend_cache.json). The pyramid and tiled modes always use PIL, the only backend that implements them per frame
 
 Input Parameters:
 - Image: Input image tensor
@@ -49,6 +60,11 @@ Input Parameters:
 - Resampling: Algorithm used for resizing
 - Supersample: Anti-aliasing method selection
 - Force_Resize: Option to force exact dimensions
+- Backend: (Optional) PIL (default), Auto, Torch, Separable or OpenCV
+- Workers: (Optional) Threads used to resize batch frames with PIL; 0 uses one per CPU core, 1 resizes frames one at a time. With supersampling, only as many frames as have intermediate images fitting in Supersample_Memory_MB run at once
+- Streaming: (Optional) disabled, Preallocated (windows into one output tensor) or Memory-Mapped (windows into an output on local disk)
+- Window_Size: (Optional) Frames rescaled per window when streaming
+- Supersample_Memory_MB: (Optional) Memory cap of the pyramid and tiled anti-aliasing modes
 
 Output:
 - Processed image tensor in the correct format for ComfyUI (B,C,H,W)
@@ -57,10 +73,14 @@ Output:
 import torch
 import numpy as np
 from PIL import Image
-from .functions import pil2tensor, tensor2pil, apply_rescale_image
+from .functions import calculate_target_size, stream_rescale, DEFAULT_SUPERSAMPLE_MEMORY_MB
+from .rescale_backends import available_backends, select_backend, AUTO_BACKEND, DEFAULT_BACKEND
 import json
 import os
+import threading
 import comfy.utils  # Add this import for the progress bar
+import comfy.model_management
+import folder_paths
 
 # Load the config file
 config_path = os.path.join(os.path.dirname(__file__), 'Scale_Factor_config.json')
@@ -74,6 +94,30 @@ except Exception as e:
     scale_values = [2.0]  # Default fallback value
 
 
+class RescaleProgress:
+    """
+    Progress callback for the rescale functions: advances the ComfyUI progress bar and raises
+    InterruptProcessingException when the queue was interrupted. Safe to call from the resize threads.
+    """
+
+    def __init__(self, total):
+        self.pbar = comfy.utils.ProgressBar(total)
+        self.interrupted = False
+        self._lock = threading.Lock()
+
+    def update(self, steps):
+        with self._lock:
+            if self.interrupted:
+                raise comfy.model_management.InterruptProcessingException()
+            try:
+                comfy.model_management.throw_exception_if_processing_interrupted()
+            except comfy.model_management.InterruptProcessingException:
+                # The interrupt flag is reset when raised; stop the other threads too
+                self.interrupted = True
+                raise
+            self.pbar.update(steps)
+
+
 class ComfyUI_EXO_ImageRescale:
 
     @classmethod
@@ -109,12 +153,43 @@ class ComfyUI_EXO_ImageRescale:
                 "Resampling": (resampling_methods, {
                     "tooltip": "Algorithm used for ALL resize operations:   Lanczos: High quality   Nearest: Fast   Bilinear: Smooth   Bicubic: Sharp"
                 }),
-                "Supersample": (["true", "false"], {
-                    "tooltip": "When enabled: Upscales 8x first   Then downscales to target size   Uses selected Resampling method"
+                "Supersample": (["true", "false", "pyramid", "tiled"], {
+                    "tooltip": "When enabled: Upscales 8x first   Then downscales to target size   Uses selected Resampling method   pyramid: Largest supersample that fits Supersample_Memory_MB, then halves step by step   tiled: Same result as true, in strips that fit Supersample_Memory_MB"
                 }),
                 "Force_Resize": (["disabled", "enabled"], {
                     "tooltip": "When enabled in Resize mode:   Forces exact dimensions   Ignores aspect ratio"
                 })
+            },
+            "optional": {
+                "Backend": ([AUTO_BACKEND] + available_backends(), {
+                    "default": DEFAULT_BACKEND,
+                    "tooltip": "PIL: Resizes each image with PIL (default)   Auto: Uses the fastest backend that matches PIL for the Resampling and Supersample settings (measured once)   Torch: Resizes the whole batch at once on the tensor   Lanczos uses bicubic with Torch   Separable: Whole batch with PIL's filter weights as matrix multiplications   OpenCV: cv2.resize when installed"
+                }),
+                "Supersample_Memory_MB": ("INT", {
+                    "default": DEFAULT_SUPERSAMPLE_MEMORY_MB,
+                    "min": 16,
+                    "max": 65536,
+                    "step": 16,
+                    "tooltip": "Memory cap for the pyramid and tiled Supersample modes   With Torch both modes use the pyramid for the whole batch   With PIL it also limits how many frames are supersampled at once"
+                }),
+                "Workers": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 256,
+                    "step": 1,
+                    "tooltip": "PIL backend: threads used to resize the frames of a batch at the same time   0: One per CPU core   1: One frame at a time   When supersampling, limited to the intermediates that fit in Supersample_Memory_MB"
+                }),
+                "Streaming": (["disabled", "Preallocated", "Memory-Mapped"], {
+                    "default": "disabled",
+                    "tooltip": "For long frame sequences:   Preallocated: Rescales Window_Size frames at a time into one output   Memory-Mapped: Same, with the output in a file in the ComfyUI temp directory instead of RAM"
+                }),
+                "Window_Size": ("INT", {
+                    "default": 16,
+                    "min": 1,
+                    "max": 4096,
+                    "step": 1,
+                    "tooltip": "Frames rescaled per window when Streaming is enabled   Smaller windows use less memory"
+                })
             }
         }
 
@@ -127,70 +202,60 @@ class ComfyUI_EXO_ImageRescale:
     FUNCTION = "process_image"
     CATEGORY = "Custom EXO Nodes"
 
-    def process_image(self, Image, Mode, Scale_Factor, Resize_Width, Resize_Height, Resampling, Supersample, Force_Resize):
-        # If Mode is "Ignore", ensure proper tensor format
+    def process_image(self, Image, Mode, Scale_Factor, Resize_Width, Resize_Height, Resampling, Supersample, Force_Resize, Backend=DEFAULT_BACKEND,
+                      Supersample_Memory_MB=DEFAULT_SUPERSAMPLE_MEMORY_MB, Workers=0,
+                      Streaming="disabled", Window_Size=16):
+        # Ensure proper tensor format (B,H,W,C)
+        if len(Image.shape) == 3:
+            Image = Image.unsqueeze(0)
+
+        # If Mode is "Ignore", pass the image through
         if Mode == "Ignore":
-            if len(Image.shape) == 3:
-                Image = Image.unsqueeze(0)
             return (Image,)
-
-        # Convert tensor to PIL image
-        pil_img = tensor2pil(Image)
-        original_width, original_height = pil_img.size
-
-        # Initialize progress bar with more steps for better granularity
-        # 2 steps for initial setup, 8 steps for supersample if enabled, 10 steps for final resize
-        total_steps = 20
-        if Supersample == "true":
-            total_steps += 10  # Add more steps for supersampling
-
-        if Mode == "Upscale":
-            pbar = comfy.utils.ProgressBar(total_steps)
-            # Update for initial setup
-            pbar.update(2)
-        else:
-            pbar = None
-
-        # Handle different modes
-        if Mode == "Resize":
-            new_width = Resize_Width
-            new_height = Resize_Height
-        elif Mode == "Upscale":
-            new_width = int(original_width * float(Scale_Factor))
-            new_height = int(original_height * float(Scale_Factor))
-        elif Mode == "Downscale":
-            new_width = int(original_width / float(Scale_Factor))
-            new_height = int(original_height / float(Scale_Factor))
-        else:
+        if Mode not in ["Upscale", "Downscale", "Resize"]:
             raise ValueError(f"Invalid mode: {Mode}")
 
-        # Ensure the new dimensions are valid
-        new_width = max(1, new_width)
-        new_height = max(1, new_height)
+        factor = float(Scale_Factor) if Mode in ["Upscale", "Downscale"] else 1.0
+
+        # Nothing to resize: skip the conversions entirely
+        original_height, original_width = Image.shape[1], Image.shape[2]
+        target_size = calculate_target_size(original_width, original_height, Mode, Force_Resize == "enabled", factor, Resize_Width, Resize_Height)
+        if Supersample == "false" and target_size == (original_width, original_height):
+            return (Image,)
+
+        comfy.model_management.throw_exception_if_processing_interrupted()
+        batch_size, channels = Image.shape[0], Image.shape[3]
 
-        # Apply the resize/rescale
-        resized_image = apply_rescale_image(
-            pil_img,
-            original_width,
-            original_height,
-            rounding_modulus=8,
+        rescale_args = dict(
             mode=Mode,
             force_resize=Force_Resize == "enabled",
-            factor=float(Scale_Factor) if Mode in ["Upscale", "Downscale"] else 1.0,
-            width=new_width,
-            height=new_height,
+            factor=factor,
+            width=Resize_Width,
+            height=Resize_Height,
             resample=Resampling,
             supersample_aa=Supersample,
-            progress_callback=pbar
+            memory_mb=Supersample_Memory_MB
         )
+        window_size = Window_Size if Streaming != "disabled" else batch_size
+        windows = [min(window_size, batch_size - start) for start in range(0, batch_size, window_size)]
+
+        backend = select_backend(Backend, Resampling, (original_width, original_height), target_size, Supersample)
+        # One progress step per resize, strip or pyramid level
+        pbar = RescaleProgress(sum(backend.steps(target_size, frames, channels, **rescale_args) for frames in windows))
+
+        def rescale(frames, out):
+            return backend.rescale(frames, out=out, progress_callback=pbar, workers=Workers, **rescale_args)
 
-        # Convert PIL image back to tensor and ensure proper format
-        image_tensor = pil2tensor(resized_image)
-        
-        # Ensure the tensor is in the correct format (B,C,H,W)
-        if len(image_tensor.shape) == 3:
-            image_tensor = image_tensor.unsqueeze(0)
-        
+        if Streaming == "disabled":
+            return (rescale(Image, None),)
+
+        image_tensor = stream_rescale(
+            Image,
+            rescale,
+            window_size=Window_Size,
+            memory_mapped=Streaming == "Memory-Mapped",
+            directory=folder_paths.get_temp_directory()
+        )
         return (image_tensor,)
 
 
@@ -33,10 +33,12 @@ Features:
 - Batch Processing: Supports generating multiple images in a single batch.
 - Configurable Defaults: Easily edit an external JSON configuration file, allowing for easy customization.
 - Format: The format is "width x height (aspect ratio).
+- Shared Zeros Mode: Optionally returns the empty latent as one cached zero expanded to the batch shape instead of allocating it, for latents that are only read (e.g. fed straight into a sampler).
 
 Inputs:
 - Dimensions: A dropdown selection for choosing the desired dimensions of the latent image. 
 - Batch_Size: An integer input specifying the number of images to generate in a single batch.
+- Latent_Mode: (Optional) Allocate (default) creates a new zero latent; Shared Zeros uses no memory but can't be modified in place by later nodes.
 
 Outputs:
 - Latent: The generated latent image noise at the specified dimensions.
@@ -44,7 +46,7 @@ Outputs:
 
 import json
 import os
-from nodes import EmptyLatentImage
+from .latent_utils import LATENT_MODES, build_dimension_table, lookup_dimensions, empty_latent
 
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -55,6 +57,9 @@ config_path = os.path.join(script_dir, 'Latent_Image_Size_config.json')
 with open(config_path, 'r') as file:
     config = json.load(file)
 
+# Parse the dimension strings once into {dimensions: (width, height)}
+DIMENSIONS = build_dimension_table(config["dimensions"])
+
 class ComfyUI_EXO_LatentImageSize:
     NAME = "ComfyUI_EXO_Latent Image Size 👑"
     CATEGORY = "Custom EXO Nodes"
@@ -76,6 +81,12 @@ class ComfyUI_EXO_LatentImageSize:
                     "tooltip": "Number of images to generate in a single batch. Higher values use more VRAM."
                 }),
             },
+            "optional": {
+                "latent_mode": (LATENT_MODES, {
+                    "default": "Allocate",
+                    "tooltip": "Allocate creates a new zero latent.   Shared Zeros uses no memory but fails if a later node modifies the latent in place."
+                }),
+            },
         }
 
     RETURN_TYPES = ("LATENT",)
@@ -83,27 +94,21 @@ class ComfyUI_EXO_LatentImageSize:
     OUTPUT_TOOLTIPS = ("The latent image noise at the specified dimensions. Connect to nodes that process latent images.",)
     FUNCTION = "generate"
 
-    def generate(self, dimensions, batch_size):
+    def generate(self, dimensions, batch_size, latent_mode="Allocate"):
         """
         Generates an empty latent image at the specified dimensions and batch size.
         
         Args:
             dimensions (str): The dimensions string in format 'width x height (aspect ratio)'
             batch_size (int): Number of images to generate in batch
+            latent_mode (str): Allocate or Shared Zeros
         
         Returns:
             tuple: Contains the generated latent image
         """
-        # Check if the selected item is a separator or space
-        if dimensions.startswith('-----') or dimensions.strip() == "":
-            raise ValueError("Please select a valid dimension setting, not a separator line")
-            
-        # Extract dimensions from the string (ignore the aspect ratio label in parentheses)
-        dimensions_part = dimensions.split('(')[0].strip()
-        result = [x.strip() for x in dimensions_part.split('x')]
-        width = int(result[0])
-        height = int(result[1])
-        latent = EmptyLatentImage().generate(width, height, batch_size)[0]
+        # Look up the pre-parsed dimensions (separators and blank lines are rejected)
+        width, height = lookup_dimensions(DIMENSIONS, dimensions)
+        latent = empty_latent(width, height, batch_size, latent_mode)
         return (latent,)
 
 # Register node mappings
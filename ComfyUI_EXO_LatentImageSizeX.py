@@ -34,20 +34,32 @@ Features
 - Additional Outputs: Provides separate outputs for the width and height of the selected dimensions.
 - Configurable Defaults: Easily edit an external JSON configuration file, allowing for easy customization.
 - Format: The format is "width x height (aspect ratio).
+- Planner Mode: Computes a VAE-aligned width and height from an aspect ratio and megapixel count, and the largest batch size that fits in memory, so a run uses the available memory without running out.
+- Shared Zeros Mode: Optionally returns the empty latent as one cached zero expanded to the batch shape instead of allocating it, for latents that are only read (e.g. fed straight into a sampler).
 
 Inputs:
 - Dimensions: A dropdown selection for choosing the desired dimensions of the latent image.
 - Batch_Size: An integer input specifying the number of images to generate in a single batch.
+- Size_Mode: (Optional) Preset uses Dimensions and Batch_Size; Planner uses the planner inputs below.
+- Aspect_Ratio: (Optional, Planner) Target aspect ratio, e.g. 16:9, 2:3 or 1.5.
+- Megapixels: (Optional, Planner) Target image size in megapixels (1 megapixel = 1024 x 1024 pixels).
+- Modulus: (Optional, Planner) Width and height are multiples of 8, 16 or 64.
+- Memory_Budget_GB: (Optional, Planner) Memory available for the sampled batch, on top of the model weights; 0 uses 90% of the free device memory less the memory the connected model still needs.
+- GB_Per_Megapixel: (Optional, Planner) Estimated sampling memory per image megapixel, used to compute the batch size when no model is connected.
+- Model: (Optional, Planner) The diffusion model to sample with. Its memory estimate for the latent shape and dtype sizes the batch, and its weights are reserved. Without it, Memory_Budget_GB must be set.
+- Latent_Mode: (Optional) Allocate (default) creates a new zero latent; Shared Zeros uses no memory but can't be modified in place by later nodes.
 
 Outputs:
 - Latent: The generated latent image noise at the specified dimensions.
 - Width: The width of the selected dimensions in pixels.
 - Height: The height of the selected dimensions in pixels.
+- Batch_Size: The batch size of the latent (planned in Planner mode).
 """
 
 import json
 import os
-from nodes import EmptyLatentImage
+from .latent_utils import LATENT_MODES, PLANNER_MODULI, build_dimension_table, lookup_dimensions, empty_latent
+from .latent_utils import plan_resolution, plan_batch_size
 
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -58,6 +70,9 @@ config_path = os.path.join(script_dir, 'Latent_Image_Size_config.json')
 with open(config_path, 'r') as file:
     config = json.load(file)
 
+# Parse the dimension strings once into {dimensions: (width, height)}
+DIMENSIONS = build_dimension_table(config["dimensions"])
+
 class ComfyUI_EXO_LatentImageSizeX:
     NAME = "ComfyUI_EXO_Latent Image Size X 👑"
     CATEGORY = "Custom EXO Nodes"
@@ -79,42 +94,91 @@ class ComfyUI_EXO_LatentImageSizeX:
                     "tooltip": "Number of images to generate in a single batch. Higher values use more VRAM."
                 }),
             },
+            "optional": {
+                "size_mode": (["Preset", "Planner"], {
+                    "default": "Preset",
+                    "tooltip": "Preset uses the dimensions and batch size above.   Planner computes them from the inputs below."
+                }),
+                "aspect_ratio": ("STRING", {
+                    "default": "16:9",
+                    "tooltip": "Planner: target aspect ratio, e.g. 16:9, 2:3 or 1.5."
+                }),
+                "megapixels": ("FLOAT", {
+                    "default": 1.0,
+                    "min": 0.1,
+                    "max": 16.0,
+                    "step": 0.05,
+                    "tooltip": "Planner: target image size in megapixels (1 megapixel = 1024 x 1024 pixels)."
+                }),
+                "modulus": (PLANNER_MODULI, {
+                    "default": "16",
+                    "tooltip": "Planner: width and height are rounded to a multiple of this value.   Flux needs 16, some VAEs and tiled workflows 64."
+                }),
+                "memory_budget_gb": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1024.0,
+                    "step": 0.5,
+                    "tooltip": "Planner: memory available for the sampled batch in GB, on top of the model weights.   0 uses 90% of the free device memory less what the connected model still needs (requires model)."
+                }),
+                "gb_per_megapixel": ("FLOAT", {
+                    "default": 1.0,
+                    "min": 0.01,
+                    "max": 64.0,
+                    "step": 0.05,
+                    "tooltip": "Planner without a model: estimated sampling memory per image megapixel in GB.   Raise it if batches run out of memory."
+                }),
+                "model": ("MODEL", {
+                    "tooltip": "Planner: connect the diffusion model that will sample the latent.   Its memory estimate and weights size the batch."
+                }),
+                "latent_mode": (LATENT_MODES, {
+                    "default": "Allocate",
+                    "tooltip": "Allocate creates a new zero latent.   Shared Zeros uses no memory but fails if a later node modifies the latent in place."
+                }),
+            },
         }
 
-    RETURN_TYPES = ("LATENT", "INT", "INT")
-    RETURN_NAMES = ("Latent", "Width", "Height")
+    RETURN_TYPES = ("LATENT", "INT", "INT", "INT")
+    RETURN_NAMES = ("Latent", "Width", "Height", "Batch_Size")
     OUTPUT_TOOLTIPS = (
         "The latent image noise at the specified dimensions. Connect to nodes that process latent images.",
         "The width of the selected dimensions in pixels.",
-        "The height of the selected dimensions in pixels."
+        "The height of the selected dimensions in pixels.",
+        "The batch size of the latent (planned in Planner mode)."
     )
     FUNCTION = "generate"
 
-    def generate(self, dimensions, batch_size):
+    def generate(self, dimensions, batch_size, size_mode="Preset", aspect_ratio="16:9", megapixels=1.0, modulus="16",
+                 memory_budget_gb=0.0, gb_per_megapixel=1.0, latent_mode="Allocate", model=None):
         """
         Generates an empty latent image at the specified dimensions and batch size.
-        Also returns the width and height as separate outputs.
+        Also returns the width, height and batch size as separate outputs.
         
         Args:
             dimensions (str): The dimensions string in format 'width x height (aspect ratio)'
             batch_size (int): Number of images to generate in batch
+            size_mode (str): Preset or Planner
+            aspect_ratio (str): Planner aspect ratio, e.g. '16:9'
+            megapixels (float): Planner image size in megapixels
+            modulus (str): Planner alignment of width and height
+            memory_budget_gb (float): Planner memory budget, 0 for the free device memory
+            gb_per_megapixel (float): Planner estimated memory per image megapixel without a model
+            latent_mode (str): Allocate or Shared Zeros
+            model: Planner diffusion model used to estimate the sampling memory
         
         Returns:
-            tuple: Contains the generated latent image, width, and height
+            tuple: Contains the generated latent image, width, height and batch size
         """
-        # Check if the selected item is a separator or space
-        if dimensions.startswith('-----') or dimensions.strip() == "":
-            raise ValueError("Please select a valid dimension setting, not a separator line")
-            
-        # Extract dimensions from the string (ignore the aspect ratio label in parentheses)
-        dimensions_part = dimensions.split('(')[0].strip()
-        result = [x.strip() for x in dimensions_part.split('x')]
-        width = int(result[0])
-        height = int(result[1])
-        
-        latent = EmptyLatentImage().generate(width, height, batch_size)[0]
+        if size_mode == "Planner":
+            width, height = plan_resolution(aspect_ratio, megapixels, int(modulus))
+            batch_size = plan_batch_size(width, height, memory_budget_gb, gb_per_megapixel, model)
+            print(f"\033[94mLatent planner: {width} x {height}, batch size {batch_size}\033[0m")
+        else:
+            # Look up the pre-parsed dimensions (separators and blank lines are rejected)
+            width, height = lookup_dimensions(DIMENSIONS, dimensions)
+        latent = empty_latent(width, height, batch_size, latent_mode)
         
-        return (latent, width, height)
+        return (latent, width, height, batch_size)
 
 # Register node mappings
 NODE_CLASS_MAPPINGS = {
@@ -35,14 +35,24 @@ Modes:
 Features:
 - Multilingual Translation from English to Chinese, French, German, Japanese, Spanish. 
 - Multilingual Translation from Chinese, French, German, Japanese, Spanish to English.
+- Auto to English: Detects the language of every chunk and translates mixed-language text with one batch per source language.
 - Model Caching: Auto Downloads and caches models on first use.
+- Model Store: Cached models are kept as memory-mapped safetensors with an integrity manifest; damaged models are downloaded again.
 - Language Detection: Detects the source language to avoid unnecessary translations.
 - UTF-8 Encoding: Ensures proper text encoding, supporting diverse characters and languages.
+- Batched Translation: Chunks from both prompts, list-mode batches and concurrent requests are gathered by a scheduler and run as padded batches per model.
+- Worker Pool: Optionally runs translation in separate worker processes that keep models warm.
+- Backends: Runs the models with Transformers (default), CTranslate2 or ONNX Runtime when installed.
 
 Inputs:
 - Positive_Text: The positive prompt text to be translated.
 - Negative_Text: The negative prompt text to be translated.
 - Translation_Model: Selects the translation language direction.
+- Execution_Mode (optional): In-Process, or Worker Pool to translate outside the ComfyUI server process.
+- Worker_Count (optional): Number of worker processes used by the Worker Pool mode.
+- Backend (optional): The inference runtime used to run the translation model.
+- Batch_Window_ms (optional): How long translation requests from other runs are gathered into one batch; 0 (default) translates right away, and the prompts of one run are always batched together.
+- Max_Batch_Size (optional): Maximum number of chunks translated in one batch.
 
 Outputs:
 - Trans_Positive_Text: The translated positive text.
@@ -59,9 +69,16 @@ import comfy.utils
 from langdetect import detect, DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
 import re
+import shutil
+from .translate_backends import available_backends, load_backend, unload_backends, DEFAULT_BACKEND
+from .translate_model_store import prepare_model_store, save_model
+from .translate_worker import get_worker_pool
+from .translate_scheduler import get_scheduler, DEFAULT_WINDOW_MS, DEFAULT_MAX_BATCH_SIZE
+from .functions import ensure_utf8, list_item
 
 # Dictionary mapping user-friendly names to their corresponding model identifiers
-# The 'None' values for "Ignore" and separator allow pass-through functionality
+# The 'None' values for "Ignore" and separator allow pass-through functionality,
+# "Auto to English" picks a model per chunk from AUTO_SOURCE_MODELS
 AVAILABLE_MODELS = {
     "Ignore": None,
     "English to Chinese (Simplified)": "Helsinki-NLP/opus-mt-en-zh",
@@ -70,6 +87,7 @@ AVAILABLE_MODELS = {
     "English to Japanese": "Helsinki-NLP/opus-mt-en-ja",
     "English to Spanish": "Helsinki-NLP/opus-mt-en-es",
     "-----": None,  # Visual separator in dropdown
+    "Auto to English": None,
     "Chinese (Simplified) to English": "Helsinki-NLP/opus-mt-zh-en",
     "French to English": "Helsinki-NLP/opus-mt-fr-en",
     "German to English": "Helsinki-NLP/opus-mt-de-en",
@@ -77,9 +95,31 @@ AVAILABLE_MODELS = {
     "Spanish to English": "Helsinki-NLP/opus-mt-es-en",
 }
 
+# Language codes (as reported by langdetect, without region) for the language names used above
+LANGUAGE_CODES = {
+    "English": "en",
+    "Chinese (Simplified)": "zh",
+    "French": "fr",
+    "German": "de",
+    "Japanese": "ja",
+    "Spanish": "es",
+}
+
+# Models used by "Auto to English" for each detected source language
+AUTO_SOURCE_MODELS = {
+    "zh": "Helsinki-NLP/opus-mt-zh-en",
+    "fr": "Helsinki-NLP/opus-mt-fr-en",
+    "de": "Helsinki-NLP/opus-mt-de-en",
+    "ja": "Helsinki-NLP/opus-mt-ja-en",
+    "es": "Helsinki-NLP/opus-mt-es-en",
+}
+
 # Store downloaded models locally in a subdirectory of the node's location
 CUSTOM_MODEL_DIR = os.path.join(os.path.dirname(__file__), "translate_models")
 
+# Where translation runs: inside the ComfyUI process or in the worker process pool
+EXECUTION_MODES = ["In-Process", "Worker Pool"]
+
 class ComfyUI_EXO_TranslateText:
     """
     A ComfyUI node that provides text translation capabilities.
@@ -91,6 +131,7 @@ class ComfyUI_EXO_TranslateText:
         self.type = "function"
         self.model = None
         self.tokenizer = None
+        self.backend = None
 
     @classmethod
     def INPUT_TYPES(s):
@@ -111,6 +152,34 @@ class ComfyUI_EXO_TranslateText:
                     "default": "Ignore", 
                     "tooltip": "Choose the language translation direction. Select 'Ignore' to pass through text without translation. Models will be downloaded on first use."
                 }),
+            },
+            "optional": {
+                "Execution_Mode": (EXECUTION_MODES, {
+                    "default": "In-Process",
+                    "tooltip": "In-Process: Translate inside ComfyUI.   Worker Pool: Translate in separate worker processes that keep models loaded, keeping the server responsive."
+                }),
+                "Worker_Count": ("INT", {
+                    "default": 2,
+                    "min": 1,
+                    "max": 16,
+                    "tooltip": "Number of worker processes used when Execution_Mode is Worker Pool."
+                }),
+                "Backend": (available_backends(), {
+                    "default": DEFAULT_BACKEND,
+                    "tooltip": "Inference runtime for the translation model. CTranslate2 and ONNX Runtime convert the cached model once on first use and are faster on CPU."
+                }),
+                "Batch_Window_ms": ("INT", {
+                    "default": DEFAULT_WINDOW_MS,
+                    "min": 0,
+                    "max": 1000,
+                    "tooltip": "How long translation requests from other runs are gathered before they are run as one batch. 0 (default) translates right away; the prompts of one run are always batched together."
+                }),
+                "Max_Batch_Size": ("INT", {
+                    "default": DEFAULT_MAX_BATCH_SIZE,
+                    "min": 1,
+                    "max": 256,
+                    "tooltip": "Maximum number of text chunks translated in one batch."
+                }),
             }
         }
 
@@ -122,39 +191,72 @@ class ComfyUI_EXO_TranslateText:
     )
     FUNCTION = "translate_text"
     CATEGORY = "Custom EXO Nodes"
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True)
 
-    def translate_text(self, Positive_Text, Negative_Text, Translation_Model):
+    def translate_text(self, Positive_Text, Negative_Text, Translation_Model, Execution_Mode=None, Worker_Count=None,
+                       Backend=None, Batch_Window_ms=None, Max_Batch_Size=None):
         """
         Main processing function that handles text translation.
+        Every input arrives as a list; list-mode batches are submitted together so their chunks are batched.
         
         Args:
-            Positive_Text (str): The positive prompt text to translate
-            Negative_Text (str): The negative prompt text to translate
-            Translation_Model (str): The selected translation model name
+            Positive_Text (list): The positive prompt texts to translate
+            Negative_Text (list): The negative prompt texts to translate
+            Translation_Model (list): The selected translation model name
+            Execution_Mode (list): Translate in-process or in the worker process pool
+            Worker_Count (list): Number of worker processes for the worker pool
+            Backend (list): The inference runtime used to run the model
+            Batch_Window_ms (list): How long the scheduler waits to gather chunks into a batch
+            Max_Batch_Size (list): Maximum number of chunks per batch
             
         Returns:
-            tuple: (translated_positive, translated_negative) - The translated texts
+            tuple: (translated_positive, translated_negative) - Lists of the translated texts
         """
-        # Ensure proper UTF-8 encoding to handle special characters
-        def ensure_utf8(text):
-            if isinstance(text, bytes):
-                return text.decode('utf-8')
-            elif isinstance(text, str):
-                return text.encode('utf-8').decode('utf-8')
-            return text
+        # Shorter input lists repeat their last value, like ComfyUI does for list inputs
+        scheduler = get_scheduler(list_item(Batch_Window_ms, 0, DEFAULT_WINDOW_MS), list_item(Max_Batch_Size, 0, DEFAULT_MAX_BATCH_SIZE))
+        count = max(len(Positive_Text), len(Negative_Text), len(Translation_Model))
 
-        Positive_Text = ensure_utf8(Positive_Text)
-        Negative_Text = ensure_utf8(Negative_Text)
+        # Submit every item before waiting on any, holding the scheduler so they are batched together
+        with scheduler.hold():
+            pending = [
+                self.submit_translation(
+                    scheduler,
+                    list_item(Positive_Text, index, ""),
+                    list_item(Negative_Text, index, ""),
+                    list_item(Translation_Model, index, "Ignore"),
+                    list_item(Execution_Mode, index, "In-Process"),
+                    list_item(Worker_Count, index, 2),
+                    list_item(Backend, index, DEFAULT_BACKEND),
+                )
+                for index in range(count)
+            ]
+        results = [wait() for wait in pending]
 
-        # Handle special cases: "Ignore" and separator
-        if Translation_Model in ["Ignore", "-----"]:
-            return (Positive_Text, Negative_Text)
+        return ([result[0] for result in results], [result[1] for result in results])
 
-        # Get and configure the translation model
-        model_name = AVAILABLE_MODELS[Translation_Model]
+    def prepare_model(self, model_name):
+        """
+        Makes sure a model is cached locally, downloading it on first use.
+        
+        Returns:
+            tuple: (model_path, error_message) - error_message is None when the model is ready
+        """
         os.environ["TRANSFORMERS_CACHE"] = CUSTOM_MODEL_DIR
         model_path = os.path.join(CUSTOM_MODEL_DIR, model_name.replace("/", "_"))
 
+        # Check the cached model; a damaged one is removed so it gets downloaded again
+        if os.path.exists(model_path):
+            try:
+                problems = prepare_model_store(model_path)
+            except Exception as e:
+                problems = [str(e)]
+            if problems:
+                print(f"\033[93mCached model '{model_name}' is damaged ({', '.join(problems)}). Downloading it again...\033[0m")
+                unload_backends(model_path)
+                for path in (model_path, model_path + ".ct2", model_path + ".onnx"):
+                    shutil.rmtree(path, ignore_errors=True)
+
         # Download and setup model if not already available locally
         if not os.path.exists(model_path):
             print(f"Model '{model_name}' not found locally. Downloading the model...")
@@ -168,54 +270,127 @@ class ComfyUI_EXO_TranslateText:
                 self.tokenizer = MarianTokenizer.from_pretrained(model_name)
                 pbar.update(1)
 
-                # Cache the model locally
-                self.model.save_pretrained(model_path)
-                self.tokenizer.save_pretrained(model_path)
+                # Cache the model locally as safetensors with an integrity manifest
+                save_model(self.model, self.tokenizer, model_path)
                 pbar.update(1)
+
+                # The backend reloads the model from the local cache
+                self.model = None
+                self.tokenizer = None
             except (RequestException, ConnectionError, Timeout, MaxRetryError) as e:
                 error_message = f"Warning - model {model_name} failed to download.\nPlease check your internet connection."
                 print(f"\033[91m{error_message}\033[0m")
-                return (error_message, error_message)
+                return (model_path, error_message)
             except Exception as e:
                 error_message = f"Error downloading the model '{model_name}': {e}"
                 print(f"\033[91m{error_message}\033[0m")
-                return (error_message, error_message)
-        else:
-            # Load cached model
-            self.model = MarianMTModel.from_pretrained(model_path)
-            self.tokenizer = MarianTokenizer.from_pretrained(model_path)
+                return (model_path, error_message)
+
+        return (model_path, None)
+
+    def get_translator(self, model_path, Execution_Mode, Worker_Count, Backend):
+        """
+        Returns what the scheduler needs to translate with a cached model.
+        
+        Returns:
+            tuple: (batch_key, translate_batch, concurrency)
+        """
+        if Execution_Mode == "Worker Pool":
+            # The workers load the model themselves; don't keep a copy in the server process
+            pool = get_worker_pool(Worker_Count)
+
+            def translate_batch(chunks):
+                return pool.translate(model_path, chunks, Backend)
+
+            return (("Worker Pool", Worker_Count, Backend, model_path), translate_batch, Worker_Count)
+
+        # Load cached model (shared and kept warm between executions)
+        self.backend = load_backend(Backend, model_path)
+        return (("In-Process", Backend, model_path), self.backend.translate, 1)
+
+    def submit_translation(self, scheduler, Positive_Text, Negative_Text, Translation_Model, Execution_Mode, Worker_Count, Backend):
+        """
+        Prepares the models and submits the chunks of one positive/negative pair to the scheduler.
+        In "Auto to English" mode every chunk is routed to the model for its detected language,
+        with one batch per model.
+        
+        Returns:
+            callable: Waits for the translations and returns (translated_positive, translated_negative)
+        """
+        def result(positive, negative):
+            return lambda: (positive, negative)
+
+        # Ensure proper UTF-8 encoding to handle special characters
+        Positive_Text = ensure_utf8(Positive_Text)
+        Negative_Text = ensure_utf8(Negative_Text)
+
+        # Handle special cases: "Ignore" and separator
+        if Translation_Model in ["Ignore", "-----"]:
+            return result(Positive_Text, Negative_Text)
 
         # Extract languages from model name for language detection
         source_language, target_language = Translation_Model.split(" to ")
+        target_code = LANGUAGE_CODES[target_language]
+        auto_source = Translation_Model == "Auto to English"
 
-        def translate_chunks(text):
-            """
-            Breaks text into chunks and translates each chunk separately.
-            Attempts to detect the language to avoid unnecessary translations.
-            """
-            chunks = re.split(r'(?<=[.,])\s*', text)
-            translated_chunks = []
-            for chunk in chunks:
-                try:
-                    detected_language = detect(chunk)
-                except LangDetectException:
-                    detected_language = "unknown"
+        def detect_language(chunk):
+            try:
+                # langdetect reports Chinese as zh-cn / zh-tw; only the language part matters here
+                return detect(chunk).split("-")[0]
+            except LangDetectException:
+                return "unknown"
+
+        # Break both texts into chunks and group the ones that need translating by model
+        texts = [re.split(r'(?<=[.,])\s*', Positive_Text), re.split(r'(?<=[.,])\s*', Negative_Text)]
+        groups = {}
+        for text_index, chunks in enumerate(texts):
+            for index, chunk in enumerate(chunks):
+                detected_language = detect_language(chunk)
 
                 # Only translate if the chunk isn't already in the target language
-                if detected_language != target_language.lower():
-                    inputs = self.tokenizer(chunk, return_tensors="pt", padding=True, truncation=True)
-                    translated = self.model.generate(**inputs)
-                    translated_text = self.tokenizer.decode(translated[0], skip_special_tokens=True)
-                    translated_chunks.append(translated_text)
+                if detected_language == target_code:
+                    continue
+                if auto_source:
+                    model_name = AUTO_SOURCE_MODELS.get(detected_language)
+                    if model_name is None:
+                        # No model for this language (or not detected); keep the chunk as it is
+                        continue
                 else:
-                    translated_chunks.append(chunk)
-            return ' '.join(translated_chunks)
+                    model_name = AVAILABLE_MODELS[Translation_Model]
+                groups.setdefault(model_name, []).append((text_index, index))
+
+        # Queue one request per model; the scheduler batches them with other pending requests
+        submitted = []
+        for model_name, positions in groups.items():
+            model_path, error_message = self.prepare_model(model_name)
+            if error_message:
+                return result(error_message, error_message)
+            try:
+                batch_key, translate_batch, concurrency = self.get_translator(model_path, Execution_Mode, Worker_Count, Backend)
+            except Exception as e:
+                error_message = f"Error loading the model '{model_name}' with the {Backend} backend: {e}"
+                print(f"\033[91m{error_message}\033[0m")
+                return result(error_message, error_message)
+            batch = [texts[text_index][index] for text_index, index in positions]
+            submitted.append((model_name, positions, scheduler.submit(batch_key, translate_batch, batch, concurrency)))
+
+        def wait():
+            for model_name, positions, future in submitted:
+                try:
+                    translations = future.result()
+                except Exception as e:
+                    error_message = f"Error translating with model '{model_name}': {e}"
+                    print(f"\033[91m{error_message}\033[0m")
+                    return (error_message, error_message)
+                for (text_index, index), translation in zip(positions, translations):
+                    texts[text_index][index] = translation
+
+            translated_positive = ' '.join(texts[0])
+            translated_negative = ' '.join(texts[1])
 
-        # Process both texts
-        translated_positive = translate_chunks(Positive_Text)
-        translated_negative = translate_chunks(Negative_Text)
+            return (translated_positive, translated_negative)
 
-        return (translated_positive, translated_negative)
+        return wait
 
 # Register the node with ComfyUI
 NODE_CLASS_MAPPINGS = {
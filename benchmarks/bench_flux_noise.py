@@ -0,0 +1,115 @@
+# 
+# bench_flux_noise.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+bench_flux_noise.py
+-----------------------------
+Benchmark of the EXO FluxSampler noise generation for batched Flux latents (16 channels, 1/8 resolution).
+Compares, per batch size:
+- batch_index: comfy.sample.prepare_noise with batch_index, one generator for the whole batch (serial)
+- serial: one prepare_noise call per element with its own seed
+- parallel: flux_noise.generate_seeded_noise on the thread pool (checked bit-identical to serial)
+
+ComfyUI must be importable; by default the ComfyUI directory two levels above this package is used.
+
+Usage:
+    python benchmarks/bench_flux_noise.py --batch-sizes 1 4 16 64 --width 1024 --height 1024
+    COMFYUI_DIR=/path/to/ComfyUI python benchmarks/bench_flux_noise.py --json bench_output.txt
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMFYUI_DIR = os.environ.get("COMFYUI_DIR", os.path.dirname(os.path.dirname(ROOT_DIR)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(1, COMFYUI_DIR)
+
+import torch
+import comfy.sample
+from flux_noise import generate_seeded_noise, NOISE_THREADS
+
+LATENT_CHANNELS = 16
+
+
+def median_time(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", nargs="*", type=int, default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=NOISE_THREADS, help="Noise threads for the parallel path")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for batch_size in args.batch_sizes:
+        latent = torch.zeros([batch_size, LATENT_CHANNELS, args.height // 8, args.width // 8])
+        seeds = [args.seed + k for k in range(batch_size)]
+
+        batch_index_seconds, _ = median_time(
+            lambda: comfy.sample.prepare_noise(latent, args.seed, list(range(batch_size))), args.repeats)
+        serial_seconds, serial = median_time(
+            lambda: torch.cat([comfy.sample.prepare_noise(latent[i:i + 1], seed) for i, seed in enumerate(seeds)]),
+            args.repeats)
+        parallel_seconds, parallel = median_time(
+            lambda: generate_seeded_noise(latent, seeds, args.threads), args.repeats)
+
+        results.append({
+            "batch_size": batch_size,
+            "batch_index_seconds": batch_index_seconds,
+            "serial_seconds": serial_seconds,
+            "parallel_seconds": parallel_seconds,
+            "speedup": serial_seconds / parallel_seconds,
+            "identical": torch.equal(serial, parallel),
+        })
+
+    print(f"\nLatent {LATENT_CHANNELS}x{args.height // 8}x{args.width // 8}, {args.threads} threads")
+    print(f"{'Batch':>6}{'batch_index (s)':>17}{'Serial (s)':>12}{'Parallel (s)':>14}{'Speedup':>9}{'Identical':>11}")
+    for result in results:
+        print(f"{result['batch_size']:>6}{result['batch_index_seconds']:>17.4f}{result['serial_seconds']:>12.4f}"
+              f"{result['parallel_seconds']:>14.4f}{result['speedup']:>8.2f}x{str(result['identical']):>11}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
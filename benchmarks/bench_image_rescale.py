@@ -0,0 +1,112 @@
+# 
+# bench_image_rescale.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+bench_image_rescale.py
+-----------------------------
+Scaling benchmark of the EXO Image Rescale PIL path: one image batch rescaled with 1 to N resize threads
+(functions.rescale_pil_batch). Reports the median time, the speedup over one thread, and checks every result
+is identical to the one thread result.
+
+Usage:
+    python benchmarks/bench_image_rescale.py --batch-size 16 --width 1024 --height 1024 --workers 1 2 4 8
+    python benchmarks/bench_image_rescale.py --mode Downscale --resampling Bicubic --json bench_output.txt
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import torch
+from functions import rescale_pil_batch, DEFAULT_RESIZE_WORKERS
+
+
+def median_time(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--mode", default="Upscale", choices=["Upscale", "Downscale", "Resize"])
+    parser.add_argument("--factor", type=float, default=2.0)
+    parser.add_argument("--resampling", default="Lanczos", choices=["Lanczos", "Nearest", "Bilinear", "Bicubic"])
+    parser.add_argument("--supersample", default="false", choices=["true", "false", "pyramid", "tiled"])
+    parser.add_argument("--workers", nargs="*", type=int, default=None, help="Thread counts (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.workers is None:
+        args.workers = [1]
+        while args.workers[-1] * 2 <= DEFAULT_RESIZE_WORKERS:
+            args.workers.append(args.workers[-1] * 2)
+        if args.workers[-1] != DEFAULT_RESIZE_WORKERS:
+            args.workers.append(DEFAULT_RESIZE_WORKERS)
+
+    images = torch.rand(args.batch_size, args.height, args.width, 3, generator=torch.Generator().manual_seed(0))
+    rescale_args = dict(mode=args.mode, factor=args.factor, width=args.width, height=args.height,
+                        resample=args.resampling, supersample_aa=args.supersample)
+
+    results = []
+    reference = None
+    for workers in args.workers:
+        seconds, output = median_time(lambda: rescale_pil_batch(images, workers=workers, **rescale_args), args.repeats)
+        if reference is None:
+            reference, single_seconds = output, seconds
+        results.append({
+            "workers": workers,
+            "seconds": seconds,
+            "frames_per_second": args.batch_size / seconds,
+            "speedup": single_seconds / seconds,
+            "identical": torch.equal(reference, output),
+        })
+
+    print(f"\n{args.batch_size} x {args.width}x{args.height}, {args.mode} {args.factor} {args.resampling}, supersample {args.supersample}")
+    print(f"{'Workers':>8}{'Time (s)':>10}{'Frames/s':>10}{'Speedup':>9}{'Identical':>11}")
+    for result in results:
+        print(f"{result['workers']:>8}{result['seconds']:>10.3f}{result['frames_per_second']:>10.2f}"
+              f"{result['speedup']:>8.2f}x{str(result['identical']):>11}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# 
+# bench_image_rescale_suite.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+bench_image_rescale_suite.py
+-----------------------------
+Benchmark suite of the EXO Image Rescale Node (process_image) and functions.apply_rescale_image.
+Every mode x resampling x supersample combination runs over a matrix of square image sizes and batch sizes
+(apply_rescale_image takes one image, so it runs once per size). Each case runs in its own process, so the
+reported peak RSS belongs to that case alone. Reported per case: median wall time, peak RSS and a SHA-256
+checksum of the output, to spot output changes between releases.
+
+Runs headless: comfy.utils, comfy.model_management and folder_paths are replaced by stubs, ComfyUI is not needed.
+Cases whose estimated memory exceeds --max-memory-mb are skipped.
+
+Usage:
+    python benchmarks/bench_image_rescale_suite.py --json bench_output.txt
+    python benchmarks/bench_image_rescale_suite.py --sizes 512 1024 --batch-sizes 1 --modes Upscale --resampling Lanczos
+    python benchmarks/bench_image_rescale_suite.py --targets function --supersample false tiled --sizes 2048 8192
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import hashlib
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ["Upscale", "Downscale", "Resize", "Force_Resize"]
+RESAMPLING = ["Bicubic", "Bilinear", "Lanczos", "Nearest"]
+SUPERSAMPLE = ["false", "true", "pyramid", "tiled"]
+SIZES = [512, 1024, 2048, 4096, 8192]
+BATCH_SIZES = [1, 4]
+CHANNELS = 3
+
+
+def install_stubs():
+    """Replace the ComfyUI modules the node imports with headless stubs."""
+    comfy = types.ModuleType("comfy")
+    comfy.__path__ = []
+
+    utils = types.ModuleType("comfy.utils")
+
+    class ProgressBar:
+        def __init__(self, total):
+            self.total = total
+            self.current = 0
+
+        def update(self, value):
+            self.current += value
+
+    utils.ProgressBar = ProgressBar
+
+    model_management = types.ModuleType("comfy.model_management")
+
+    class InterruptProcessingException(Exception):
+        pass
+
+    model_management.InterruptProcessingException = InterruptProcessingException
+    model_management.throw_exception_if_processing_interrupted = lambda: None
+
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.get_temp_directory = tempfile.gettempdir
+
+    comfy.utils = utils
+    comfy.model_management = model_management
+    sys.modules.update({"comfy": comfy, "comfy.utils": utils, "comfy.model_management": model_management,
+                        "folder_paths": folder_paths})
+
+
+def load_package():
+    """Import the node package from ROOT_DIR without running its __init__ (which loads every node)."""
+    package = types.ModuleType("exo_nodes")
+    package.__path__ = [ROOT_DIR]
+    sys.modules["exo_nodes"] = package
+    return (importlib.import_module("exo_nodes.ComfyUI_EXO_ImageRescale"),
+            importlib.import_module("exo_nodes.functions"))
+
+
+def test_images(batch_size, size):
+    """A smooth, deterministic [B,H,W,C] test batch."""
+    import torch
+    generator = torch.Generator().manual_seed(0)
+    coarse = torch.rand(batch_size, CHANNELS, max(2, size // 32), max(2, size // 32), generator=generator)
+    return torch.nn.functional.interpolate(coarse, size=(size, size), mode="bilinear").clamp(0.0, 1.0).movedim(1, -1).contiguous()
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None when it can't be measured."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+        except ImportError:
+            return None
+
+
+def run_case(case):
+    """Run one benchmark case in this process and return its result."""
+    install_stubs()
+    node_module, functions = load_package()
+    import numpy as np
+
+    images = test_images(case["batch_size"], case["size"])
+    mode = "Resize" if case["mode"] == "Force_Resize" else case["mode"]
+    force_resize = "enabled" if case["mode"] == "Force_Resize" else "disabled"
+
+    if case["target"] == "node":
+        node = node_module.ComfyUI_EXO_ImageRescale()
+
+        def run():
+            return node.process_image(images, mode, case["factor"], case["resize"][0], case["resize"][1],
+                                      case["resampling"], case["supersample"], force_resize, case["backend"],
+                                      case["memory_mb"], case["workers"])[0]
+
+        def checksum(output):
+            return hashlib.sha256(output.contiguous().numpy().tobytes()).hexdigest()
+    else:
+        pil_img = functions.tensor2pil(images[0])
+
+        def run():
+            return functions.apply_rescale_image(
+                pil_img, pil_img.size[0], pil_img.size[1], rounding_modulus=8, mode=mode,
+                force_resize=force_resize == "enabled", supersample_aa=case["supersample"], factor=case["factor"],
+                width=case["resize"][0], height=case["resize"][1], resample=case["resampling"], memory_mb=case["memory_mb"])
+
+        def checksum(output):
+            return hashlib.sha256(np.asarray(output).tobytes()).hexdigest()
+
+    timings = []
+    for _ in range(case["repeats"]):
+        start = time.perf_counter()
+        output = run()
+        timings.append(time.perf_counter() - start)
+    size = tuple(output.shape[1:3]) if case["target"] == "node" else (output.size[1], output.size[0])
+    return {
+        "seconds": statistics.median(timings),
+        "peak_rss_mb": peak_rss_mb(),
+        "output_size": list(size),
+        "checksum": checksum(output),
+    }
+
+
+def estimated_memory_mb(case):
+    """Rough peak memory of a case: float input and output plus the largest intermediate image."""
+    pixels = case["size"] ** 2
+    if case["mode"] in ("Upscale", "Downscale"):
+        scale = case["factor"] if case["mode"] == "Upscale" else 1 / case["factor"]
+        target = pixels * scale * scale
+    else:
+        target = case["resize"][0] * case["resize"][1]
+    batch = case["batch_size"] if case["target"] == "node" else 1
+    total = batch * (pixels + target) * CHANNELS * 4
+    budget = case["memory_mb"] * 1024 * 1024
+    if case["supersample"] == "true":
+        if case["backend"] in ("Torch", "Separable", "OpenCV"):
+            total += target * 64 * CHANNELS * 4 * batch
+        else:
+            # PIL threads only supersample as many frames at once as fit in memory_mb
+            frame = target * 64 * CHANNELS
+            total += frame * min(batch, os.cpu_count() or 1, max(1, budget // frame))
+    elif case["supersample"] in ("pyramid", "tiled"):
+        total += budget
+    return total / 1024 / 1024
+
+
+def build_cases(args):
+    cases = []
+    for target in args.targets:
+        for size in args.sizes:
+            for batch_size in (args.batch_sizes if target == "node" else [1]):
+                for mode in args.modes:
+                    for resampling in args.resampling:
+                        for supersample in args.supersample:
+                            cases.append({
+                                "target": target, "size": size, "batch_size": batch_size, "mode": mode,
+                                "resampling": resampling, "supersample": supersample, "factor": args.factor,
+                                "resize": args.resize, "backend": args.backend, "memory_mb": args.memory_mb,
+                                "workers": args.workers, "repeats": args.repeats,
+                            })
+    return cases
+
+
+def host_info():
+    import torch
+    import PIL
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(),
+            "torch": torch.__version__, "PIL": PIL.__version__}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="*", default=["node", "function"], choices=["node", "function"])
+    parser.add_argument("--modes", nargs="*", default=MODES, choices=MODES)
+    parser.add_argument("--resampling", nargs="*", default=RESAMPLING, choices=RESAMPLING)
+    parser.add_argument("--supersample", nargs="*", default=SUPERSAMPLE, choices=SUPERSAMPLE)
+    parser.add_argument("--sizes", nargs="*", type=int, default=SIZES, help="Square input sizes in pixels")
+    parser.add_argument("--batch-sizes", nargs="*", type=int, default=BATCH_SIZES, help="Batch sizes of the node cases")
+    parser.add_argument("--factor", type=float, default=2.0, help="Scale factor of Upscale and Downscale")
+    parser.add_argument("--resize", nargs=2, type=int, default=[1280, 720], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--backend", default="PIL", help="Backend input of the node (Auto, PIL, Torch, Separable, OpenCV)")
+    parser.add_argument("--memory-mb", type=int, default=512, help="Supersample_Memory_MB of the pyramid and tiled modes")
+    parser.add_argument("--workers", type=int, default=0, help="Workers input of the node")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--max-memory-mb", type=float, default=8192, help="Skip cases estimated to need more memory")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds before a case is abandoned")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    results = []
+    header = f"{'Target':<9}{'Size':>6}{'Batch':>6} {'Mode':<13}{'Resampling':<11}{'SS':<8}{'Time (s)':>10}{'Peak RSS (MB)':>15}  Checksum"
+    print(header)
+    for case in build_cases(args):
+        result = dict(case)
+        estimate = estimated_memory_mb(case)
+        if estimate > args.max_memory_mb:
+            result["status"] = f"skipped (estimated {estimate:.0f} MB)"
+        else:
+            try:
+                completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+                                           capture_output=True, text=True, timeout=args.timeout)
+                if completed.returncode == 0:
+                    result.update(json.loads(completed.stdout.strip().splitlines()[-1]))
+                    result["status"] = "ok"
+                elif completed.returncode < 0:
+                    result["status"] = f"killed by signal {-completed.returncode} (out of memory?)"
+                else:
+                    result["status"] = f"failed: {(completed.stderr.strip().splitlines() or ['exit code ' + str(completed.returncode)])[-1]}"
+            except subprocess.TimeoutExpired:
+                result["status"] = f"timed out after {args.timeout:.0f} s"
+        results.append(result)
+
+        prefix = f"{case['target']:<9}{case['size']:>6}{case['batch_size']:>6} {case['mode']:<13}{case['resampling']:<11}{case['supersample']:<8}"
+        if result["status"] == "ok":
+            rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "n/a"
+            print(f"{prefix}{result['seconds']:>10.3f}{rss:>15}  {result['checksum'][:16]}")
+        else:
+            print(f"{prefix}  {result['status']}")
+
+    if args.json_path:
+        settings = {key: value for key, value in vars(args).items() if key != "run_case"}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"host": host_info(), "settings": settings, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# 
+# bench_translate_backends.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+bench_translate_backends.py
+-----------------------------
+Side-by-side benchmark of the EXO Translate Text backends (Transformers, CTranslate2, ONNX Runtime).
+Runs outside ComfyUI. The model is downloaded into translate_models/ on first use, exactly like the node does,
+and each installed backend converts it once before it is timed.
+
+Usage:
+    python benchmarks/bench_translate_backends.py --model Helsinki-NLP/opus-mt-es-en --batch-sizes 1 8 32
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from translate_backends import TRANSLATION_BACKENDS, available_backends
+from translate_model_store import save_model
+
+SAMPLE_CHUNKS = [
+    "Un retrato de una mujer joven con el pelo rojo,",
+    "iluminación suave de estudio,",
+    "fondo de un bosque nevado al atardecer.",
+    "Fotografía muy detallada, lente de 85 mm,",
+    "colores cálidos y una atmósfera tranquila.",
+]
+
+
+def ensure_model(model_name, model_dir):
+    """Download and cache the model the same way the node does."""
+    model_path = os.path.join(model_dir, model_name.replace("/", "_"))
+    if not os.path.exists(model_path):
+        from transformers import MarianMTModel, MarianTokenizer
+        print(f"Downloading {model_name}...")
+        save_model(MarianMTModel.from_pretrained(model_name), MarianTokenizer.from_pretrained(model_name), model_path)
+    return model_path
+
+
+def bench_backend(name, model_path, batch_sizes, repeats):
+    backend_class = TRANSLATION_BACKENDS[name]
+    # Convert outside the timed load so one-time conversion doesn't skew the numbers
+    backend_class(model_path)
+
+    start = time.perf_counter()
+    backend = backend_class(model_path)
+    load_seconds = time.perf_counter() - start
+
+    result = {"backend": name, "load_seconds": load_seconds, "batches": []}
+    for batch_size in batch_sizes:
+        chunks = [SAMPLE_CHUNKS[i % len(SAMPLE_CHUNKS)] for i in range(batch_size)]
+        backend.translate(chunks)  # warm-up
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            translations = backend.translate(chunks)
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        result["batches"].append({
+            "batch_size": batch_size,
+            "median_seconds": median,
+            "chunks_per_second": batch_size / median,
+            "sample": translations[0],
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Helsinki-NLP/opus-mt-es-en", help="Hugging Face model name")
+    parser.add_argument("--model-dir", default=os.path.join(ROOT_DIR, "translate_models"))
+    parser.add_argument("--backends", nargs="*", default=None, help="Backends to compare (default: all installed)")
+    parser.add_argument("--batch-sizes", nargs="*", type=int, default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    model_path = ensure_model(args.model, args.model_dir)
+    backends = args.backends or available_backends()
+    results = [bench_backend(name, model_path, args.batch_sizes, args.repeats) for name in backends]
+
+    print(f"\nModel: {args.model}")
+    print(f"{'Backend':<14}{'Load (s)':>10}{'Batch':>8}{'Median (s)':>12}{'Chunks/s':>10}{'Speedup':>9}")
+    baseline = {b["batch_size"]: b["median_seconds"] for b in results[0]["batches"]} if results else {}
+    for result in results:
+        for batch in result["batches"]:
+            speedup = baseline[batch["batch_size"]] / batch["median_seconds"]
+            print(f"{result['backend']:<14}{result['load_seconds']:>10.2f}{batch['batch_size']:>8}"
+                  f"{batch['median_seconds']:>12.4f}{batch['chunks_per_second']:>10.1f}{speedup:>8.2f}x")
+    for result in results:
+        print(f"{result['backend']}: {result['batches'][0]['sample']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "results": results}, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# 
+# bench_translate_scheduler.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+bench_translate_scheduler.py
+-----------------------------
+Throughput benchmark for the EXO Translate Text micro-batching scheduler under simulated concurrent load.
+Several client threads submit small translation requests. The same load is run once with every client calling
+the model directly (one generate call per request) and once through the scheduler.
+
+By default the model is simulated: a call costs a fixed overhead plus a small per-chunk cost, which is how
+generate behaves for short Marian inputs on CPU. Pass --model-path to run a real cached model instead.
+
+Usage:
+    python benchmarks/bench_translate_scheduler.py --clients 8 --requests 20
+    python benchmarks/bench_translate_scheduler.py --model-path translate_models/Helsinki-NLP_opus-mt-es-en
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import threading
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from translate_scheduler import MicroBatchScheduler
+
+SAMPLE_CHUNKS = [
+    "Un retrato de una mujer joven con el pelo rojo,",
+    "iluminación suave de estudio,",
+    "fondo de un bosque nevado al atardecer.",
+    "colores cálidos y una atmósfera tranquila.",
+]
+
+
+class SimulatedModel:
+    """Stands in for a model: a call costs overhead_ms plus per_chunk_ms per chunk, one call at a time."""
+
+    def __init__(self, overhead_ms, per_chunk_ms):
+        self.overhead = overhead_ms / 1000.0
+        self.per_chunk = per_chunk_ms / 1000.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def translate(self, chunks):
+        with self._lock:
+            self.calls += 1
+            time.sleep(self.overhead + self.per_chunk * len(chunks))
+            return [chunk.upper() for chunk in chunks]
+
+
+class CountingModel:
+    """Wraps a real backend, serializing calls and counting them."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def translate(self, chunks):
+        with self._lock:
+            self.calls += 1
+            return self.backend.translate(chunks)
+
+
+def run_load(model, submit, clients, requests, chunks_per_request, arrival_ms, seed):
+    """Run the client threads and return (wall seconds, request latencies)."""
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def client(index):
+        rng = random.Random(seed + index)
+        for _ in range(requests):
+            time.sleep(rng.uniform(0, 2 * arrival_ms) / 1000.0)
+            chunks = [rng.choice(SAMPLE_CHUNKS) for _ in range(chunks_per_request)]
+            start = time.perf_counter()
+            submit(chunks)
+            with latencies_lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def summarize(name, model, wall, latencies, total_chunks):
+    latencies = sorted(latencies)
+    return {
+        "mode": name,
+        "wall_seconds": wall,
+        "chunks_per_second": total_chunks / wall,
+        "model_calls": model.calls,
+        "latency_p50_ms": 1000 * statistics.median(latencies),
+        "latency_p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--chunks", type=int, default=3, help="Chunks per request")
+    parser.add_argument("--arrival-ms", type=float, default=5.0, help="Mean gap between a client's requests")
+    parser.add_argument("--window-ms", type=int, default=10)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--overhead-ms", type=float, default=40.0, help="Simulated fixed cost per generate call")
+    parser.add_argument("--per-chunk-ms", type=float, default=4.0, help="Simulated cost per chunk in a batch")
+    parser.add_argument("--model-path", default=None, help="Benchmark a real cached model instead of the simulation")
+    parser.add_argument("--backend", default="Transformers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    def make_model():
+        if args.model_path:
+            from translate_backends import load_backend
+            return CountingModel(load_backend(args.backend, os.path.abspath(args.model_path)))
+        return SimulatedModel(args.overhead_ms, args.per_chunk_ms)
+
+    total_chunks = args.clients * args.requests * args.chunks
+    load = (args.clients, args.requests, args.chunks, args.arrival_ms, args.seed)
+    results = []
+
+    model = make_model()
+    model.translate(SAMPLE_CHUNKS)  # warm-up
+    model.calls = 0
+    wall, latencies = run_load(model, model.translate, *load)
+    results.append(summarize("direct", model, wall, latencies, total_chunks))
+
+    model = make_model()
+    model.translate(SAMPLE_CHUNKS)
+    model.calls = 0
+    scheduler = MicroBatchScheduler(args.window_ms, args.max_batch_size)
+    wall, latencies = run_load(model, lambda chunks: scheduler.submit("model", model.translate, chunks).result(), *load)
+    results.append(summarize("scheduler", model, wall, latencies, total_chunks))
+
+    print(f"\n{args.clients} clients x {args.requests} requests x {args.chunks} chunks "
+          f"(window {args.window_ms} ms, max batch {args.max_batch_size})")
+    print(f"{'Mode':<11}{'Wall (s)':>10}{'Chunks/s':>10}{'Calls':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for result in results:
+        print(f"{result['mode']:<11}{result['wall_seconds']:>10.2f}{result['chunks_per_second']:>10.1f}"
+              f"{result['model_calls']:>8}{result['latency_p50_ms']:>10.1f}{result['latency_p95_ms']:>10.1f}")
+    print(f"Throughput gain: {results[1]['chunks_per_second'] / results[0]['chunks_per_second']:.2f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
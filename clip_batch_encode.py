@@ -0,0 +1,283 @@
+# 
+# clip_batch_encode.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+clip_batch_encode.py
+-----------------------------
+The Clip Batch Encode module is used with the EXO Clip Text Encode Node to encode several token sets with fewer forward passes. ComfyUI encodes one prompt at a time, running each text encoder (CLIP-L, CLIP-G, T5) on that prompt's token chunks. While the prompts are encoded, every text encoder's encode call is intercepted: the rows of the prompts still waiting are added to the current call as one padded batch, and later calls for those prompts are answered from the result.
+
+Encoder outputs are also cached per token chunk, keyed by (model fingerprint, text encoder, chunk position, chunk token ids). When only the tail of a long prompt changes, only the changed chunks are run through the text encoder and the rest are taken from the cache. Identical chunks in the same batch are encoded once.
+
+The rest of the encoding (prompt weights, pooled output, attention masks, the conditioning dict) still runs through ComfyUI for every prompt, so the outputs have the usual [[cond, {"pooled_output": ...}]] structure. Rows are only batched when they have the same length, and a later call is only answered from the batch when its rows are exactly the rows that were encoded; anything else is encoded normally.
+"""
+
+import torch
+
+from .clip_conditioning_cache import chunk_cache
+
+# Largest number of token rows encoded in one forward pass
+DEFAULT_MAX_BATCH_ROWS = 32
+
+
+def find_text_encoders(clip, tokens):
+    """
+    Return the text encoder used for each token key, e.g. {"l": clip_l, "t5xxl": t5xxl}.
+    Keys whose encoder can't be found are left out and encoded normally.
+    """
+    model = getattr(clip, "cond_stage_model", None)
+    encoders = {}
+    for key in tokens:
+        candidates = [getattr(model, key, None), getattr(model, f"clip_{key}", None)]
+        if isinstance(getattr(model, "clip", None), str):
+            # Single encoder models store the encoder's attribute name in .clip
+            candidates.append(getattr(model, model.clip, None))
+        for encoder in candidates:
+            if isinstance(encoder, torch.nn.Module) and hasattr(encoder, "encode"):
+                encoders[key] = encoder
+                break
+    return encoders
+
+
+def _plain_rows(rows):
+    """True for a list of equal length rows of token ids (no embedding tensors)."""
+    if not isinstance(rows, (list, tuple)) or not rows:
+        return False
+    length = len(rows[0])
+    return all(len(row) == length and all(type(token) is int for token in row) for row in rows)
+
+
+def expected_rows(encoder, token_weight_pairs):
+    """
+    Predict the rows ComfyUI passes to encoder.encode for one prompt's token chunks:
+    the token ids of every chunk plus an empty row when the prompt has weights.
+    """
+    rows = [[pair[0] for pair in chunk] for chunk in token_weight_pairs]
+    has_weights = any(pair[1] != 1.0 for chunk in token_weight_pairs for pair in chunk)
+    if has_weights or not rows:
+        length = max((len(row) for row in rows), default=0)
+        gen_empty_tokens = getattr(encoder, "gen_empty_tokens", None)
+        if gen_empty_tokens is None:
+            try:
+                from comfy.sd1_clip import gen_empty_tokens
+            except ImportError:
+                return None
+        try:
+            rows.append(gen_empty_tokens(encoder.special_tokens, length))
+        except (AttributeError, TypeError, KeyError):
+            return None
+    return rows if _plain_rows(rows) else None
+
+
+def _split_output(output, counts):
+    """Split an encode output (tensors, None or dicts of them) by batch rows; None if it can't be split."""
+    total = sum(counts)
+    bounds = [sum(counts[:i]) for i in range(len(counts) + 1)]
+
+    def split(value):
+        if isinstance(value, torch.Tensor):
+            if value.dim() == 0 or value.shape[0] != total:
+                raise ValueError("output without a batch dimension")
+            return [value[bounds[i]:bounds[i + 1]] for i in range(len(counts))]
+        if isinstance(value, dict):
+            parts = {key: split(item) for key, item in value.items()}
+            return [{key: part[i] for key, part in parts.items()} for i in range(len(counts))]
+        if isinstance(value, (tuple, list)):
+            parts = [split(item) for item in value]
+            return [type(value)(part[i] for part in parts) for i in range(len(counts))]
+        return [value] * len(counts)
+
+    try:
+        return split(output)
+    except ValueError:
+        return None
+
+
+def _join_outputs(parts):
+    """Concatenate split encode outputs back into one, the inverse of _split_output."""
+    first = parts[0]
+    if len(parts) == 1:
+        return first
+    if isinstance(first, torch.Tensor):
+        return torch.cat(parts)
+    if isinstance(first, dict):
+        return {key: _join_outputs([part[key] for part in parts]) for key in first}
+    if isinstance(first, (tuple, list)):
+        return type(first)(_join_outputs([part[i] for part in parts]) for i in range(len(first)))
+    return first
+
+
+class BatchedEncode:
+    """
+    Context manager that batches the text encoder calls of several token sets.
+    Set .current to the index of the token set before encoding it; the sets may be encoded in any order.
+    With a model fingerprint, encoded chunks are also kept in the chunk cache and reused.
+    """
+
+    def __init__(self, clip, token_sets, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, fingerprint=None):
+        self.clip = clip
+        self.fingerprint = fingerprint
+        self.token_sets = token_sets
+        self.max_batch_rows = max_batch_rows
+        self.current = None
+        self.forward_passes = 0
+        self._installed = []
+
+    def __enter__(self):
+        encoders = {}
+        for tokens in self.token_sets:
+            if isinstance(tokens, dict):
+                encoders.update(find_text_encoders(self.clip, tokens))
+        installed = set()
+        for key, encoder in encoders.items():
+            if id(encoder) in installed:
+                continue
+            installed.add(id(encoder))
+            rows = {}
+            for index, tokens in enumerate(self.token_sets):
+                if isinstance(tokens, dict) and key in tokens:
+                    predicted = expected_rows(encoder, tokens[key])
+                    if predicted is not None:
+                        rows[index] = predicted
+            self._install(key, encoder, rows)
+        return self
+
+    def __exit__(self, *exc_info):
+        for encoder, previous in reversed(self._installed):
+            if previous is None:
+                del encoder.encode
+            else:
+                encoder.encode = previous
+        self._installed = []
+        return False
+
+    def _install(self, name, encoder, pending):
+        previous = encoder.__dict__.get("encode")
+        original = encoder.encode
+        stash = {}
+
+        def chunk_key(position, row):
+            return (self.fingerprint, name, position, tuple(row))
+
+        def encode(rows):
+            current = self.current
+            if current in stash:
+                stashed_rows, output = stash.pop(current)
+                if _plain_rows(rows) and rows == stashed_rows:
+                    return output
+            pending.pop(current, None)
+            if not _plain_rows(rows):
+                self.forward_passes += 1
+                return original(rows)
+
+            # Chunks encoded before are taken from the chunk cache
+            row_outputs = {}
+            if self.fingerprint is not None:
+                for position, row in enumerate(rows):
+                    cached = chunk_cache.get(chunk_key(position, row))
+                    if cached is not None:
+                        row_outputs[tuple(row)] = cached
+            missing = {tuple(row) for row in rows} - set(row_outputs)
+            if not missing:
+                return _join_outputs([row_outputs[tuple(row)] for row in rows])
+
+            # Add the rows of prompts still waiting, if they have the same length, in encoding order
+            length = len(rows[0])
+            batch = [(current, rows)]
+            run = list(missing)
+            for index, predicted in sorted(pending.items(), key=lambda item: len(item[1])):
+                if len(predicted[0]) != length:
+                    continue
+                # Plan with the non-counting contains(); cached rows are only fetched once the prompt is added
+                new_rows = set()
+                cached_rows = {}
+                for position, row in enumerate(predicted):
+                    row = tuple(row)
+                    if row in missing or row in row_outputs or row in new_rows or row in cached_rows:
+                        continue
+                    key = chunk_key(position, row)
+                    if self.fingerprint is not None and chunk_cache.contains(key):
+                        cached_rows[row] = key
+                    else:
+                        new_rows.add(row)
+                if len(run) + len(new_rows) > self.max_batch_rows:
+                    continue
+                batch.append((index, predicted))
+                for row, key in cached_rows.items():
+                    cached = chunk_cache.get(key)
+                    if cached is not None:
+                        row_outputs[row] = cached
+                    else:
+                        # Evicted since it was checked
+                        new_rows.add(row)
+                missing |= new_rows
+                run.extend(new_rows)
+
+            # Identical chunks (within or across prompts) are encoded once
+            self.forward_passes += 1
+            output = original([list(row) for row in run])
+            parts = _split_output(output, [1] * len(run))
+            if parts is None:
+                # Can't tell which rows belong to which prompt; encode this prompt on its own
+                self.forward_passes += 1
+                return original(rows)
+            row_outputs.update(zip(run, parts))
+
+            for index, part in batch:
+                if self.fingerprint is not None:
+                    for position, row in enumerate(part):
+                        key = chunk_key(position, row)
+                        if tuple(row) in missing and not chunk_cache.contains(key):
+                            chunk_cache.put(key, row_outputs[tuple(row)])
+                if index != current:
+                    pending.pop(index, None)
+                    stash[index] = (part, _join_outputs([row_outputs[tuple(row)] for row in part]))
+            return _join_outputs([row_outputs[tuple(row)] for row in rows])
+
+        encoder.encode = encode
+        self._installed.append((encoder, previous))
+
+
+def encode_token_sets(clip, token_sets, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, fingerprint=None):
+    """
+    Encode several tokenized prompts, batching the text encoder forward passes.
+    When a model fingerprint is given, only token chunks missing from the chunk cache are encoded.
+
+    Returns:
+        list: One encoder output dict ("cond", "pooled_output", ...) per token set, as returned by
+        clip.encode_from_tokens(tokens, return_pooled=True, return_dict=True)
+    """
+    if len(token_sets) < 2 and fingerprint is None:
+        return [clip.encode_from_tokens(tokens, return_pooled=True, return_dict=True) for tokens in token_sets]
+    # Encode prompts with the same number of token chunks one after another, so they share batches
+    def chunk_count(index):
+        tokens = token_sets[index]
+        return sum(len(chunks) for chunks in tokens.values()) if isinstance(tokens, dict) else 0
+
+    outputs = [None] * len(token_sets)
+    with BatchedEncode(clip, token_sets, max_batch_rows, fingerprint) as batch:
+        for index in sorted(range(len(token_sets)), key=chunk_count):
+            batch.current = index
+            outputs[index] = clip.encode_from_tokens(token_sets[index], return_pooled=True, return_dict=True)
+    return outputs
@@ -0,0 +1,335 @@
+# 
+# clip_conditioning_cache.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+clip_conditioning_cache.py
+-----------------------------
+The Clip Conditioning Cache module is used with the EXO Clip Text Encode Node to skip encoding texts that were encoded before with the same CLIP model. Entries are keyed by a fingerprint of the model (weights, LoRA patches and clip layer) together with the text.
+
+Features:
+- Memory Tier: A least recently used cache on the CPU with a byte budget (see lru_cache). Tensors are stored in their original precision and restored to their original device when used, so a cached encoding is identical to a fresh one.
+- Disk Tier: Optional safetensors files in clip_cache/ that survive restarts, pruned oldest first when over their own byte budget. Files written in another storage format (e.g. the earlier float16 files) are ignored and rewritten.
+- Chunk Cache: Text encoder outputs of single token chunks, kept in their original precision, so a long prompt whose tail changed only re-encodes the changed chunks (see clip_batch_encode.py).
+- Statistics: Hit and miss counters for both tiers and the chunk cache, available from get_stats() and the /comfyui_exo/clip-cache/stats route.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import threading
+import weakref
+
+import torch
+
+from .lru_cache import LRUCache
+
+# Default byte budgets for the two tiers and the chunk cache
+DEFAULT_MEMORY_BUDGET_MB = 512
+DEFAULT_DISK_BUDGET_MB = 2048
+DEFAULT_CHUNK_BUDGET_MB = 256
+
+# Disk tier location
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clip_cache")
+
+# Storage format of the disk tier files; files of other formats are ignored (format 1 stored float16 tensors)
+STORAGE_FORMAT = 2
+
+# Values sampled from each tensor when fingerprinting a model
+FINGERPRINT_SAMPLES = 8
+
+# Fingerprints of the CLIP weights, computed once per loaded model: patcher -> (patches_uuid, fingerprint)
+_fingerprints = weakref.WeakKeyDictionary()
+_fingerprint_lock = threading.Lock()
+
+
+def _hash_tensor(digest, tensor):
+    """Hash a tensor's shape, dtype and a strided sample of its values."""
+    digest.update(f"{tuple(tensor.shape)}{tensor.dtype}".encode())
+    if tensor.is_meta or tensor.numel() == 0:
+        return
+    flat = tensor.detach().reshape(-1)
+    step = max(1, flat.numel() // FINGERPRINT_SAMPLES)
+    sample = torch.cat((flat[:FINGERPRINT_SAMPLES], flat[::step][:FINGERPRINT_SAMPLES]))
+    digest.update(sample.float().cpu().numpy().tobytes())
+
+
+def _hash_value(digest, value, depth=0):
+    """Hash patch data of any shape (tuples of tensors, weight adapter objects, strengths)."""
+    if depth > 8:
+        return
+    if isinstance(value, torch.Tensor):
+        _hash_tensor(digest, value)
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            digest.update(str(key).encode())
+            _hash_value(digest, value[key], depth + 1)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"[{len(value)}".encode())
+        for item in value:
+            _hash_value(digest, item, depth + 1)
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        digest.update(repr(value).encode())
+    elif callable(value) and not hasattr(value, "__dict__"):
+        digest.update(getattr(value, "__qualname__", type(value).__name__).encode())
+    else:
+        digest.update(type(value).__name__.encode())
+        _hash_value(digest, vars(value) if hasattr(value, "__dict__") else repr(value), depth + 1)
+
+
+def _weights_fingerprint(patcher):
+    digest = hashlib.sha256()
+    model = getattr(patcher, "model", None)
+    digest.update(type(model).__name__.encode())
+    if isinstance(model, torch.nn.Module):
+        for name, tensor in model.state_dict().items():
+            digest.update(name.encode())
+            _hash_tensor(digest, tensor)
+    _hash_value(digest, getattr(patcher, "patches", {}))
+    return digest.hexdigest()
+
+
+def model_fingerprint(clip):
+    """
+    Return a stable fingerprint of a CLIP object: its weights, LoRA patches and encode settings.
+    The weights part is computed once per loaded model and again only when its patches change.
+    """
+    patcher = getattr(clip, "patcher", None)
+    if patcher is None:
+        return None
+    patches_uuid = getattr(patcher, "patches_uuid", None)
+    with _fingerprint_lock:
+        cached = _fingerprints.get(patcher)
+        if cached is not None and patches_uuid is not None and cached[0] == patches_uuid:
+            weights = cached[1]
+        else:
+            weights = _weights_fingerprint(patcher)
+            _fingerprints[patcher] = (patches_uuid, weights)
+
+    digest = hashlib.sha256(weights.encode())
+    digest.update(repr(getattr(clip, "layer_idx", None)).encode())
+    digest.update(repr(sorted(getattr(clip, "tokenizer_options", {}).items())).encode())
+    return digest.hexdigest()
+
+
+class _Entry:
+    """One cached encoder output: CPU copies of its tensors in full precision plus the devices to restore them to."""
+
+    def __init__(self, output):
+        self.tensors = {}
+        self.values = {}
+        self.restore = {}
+        self.nbytes = 0
+        for name, value in output.items():
+            if isinstance(value, torch.Tensor):
+                stored = value.detach().to("cpu", copy=True).contiguous()
+                self.tensors[name] = stored
+                self.restore[name] = (value.dtype, value.device)
+                self.nbytes += stored.numel() * stored.element_size()
+            else:
+                self.values[name] = value
+
+    def output(self):
+        """Rebuild the encoder output with fresh tensors on their original device."""
+        output = dict(self.values)
+        for name, tensor in self.tensors.items():
+            dtype, device = self.restore[name]
+            output[name] = tensor.to(device=device, dtype=dtype, copy=True)
+        return output
+
+
+class ConditioningCache(LRUCache):
+    """
+    Two-tier cache of CLIP encoder outputs keyed by (model fingerprint, text).
+    The memory tier is an LRU bounded by memory_budget_mb (its hits are counted in hits); the disk tier is only
+    used when enabled.
+    """
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, disk_budget_mb=DEFAULT_DISK_BUDGET_MB, cache_dir=CACHE_DIR):
+        super().__init__(memory_budget_mb)
+        self.disk_budget = disk_budget_mb * 1024 * 1024
+        self.cache_dir = cache_dir
+        self.disk_hits = 0
+
+    @staticmethod
+    def _file_name(key):
+        return hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest() + ".safetensors"
+
+    def get(self, key, use_disk=False):
+        """Return a copy of the cached encoder output for key, or None."""
+        entry = self.lookup(key, count_miss=False)
+        if entry is not None:
+            return entry.output()
+
+        entry = self._read_disk(key) if use_disk else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self.store(key, entry, entry.nbytes)
+        return entry.output()
+
+    def put(self, key, output, use_disk=False):
+        """Store an encoder output; the caller keeps ownership of the tensors it passed in."""
+        entry = _Entry(output)
+        self.store(key, entry, entry.nbytes)
+        if use_disk:
+            self._write_disk(key, entry)
+
+    def _read_disk(self, key):
+        from safetensors.torch import load_file
+        path = os.path.join(self.cache_dir, self._file_name(key))
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.read(struct.unpack("<Q", f.read(8))[0]))
+            metadata = json.loads(header["__metadata__"]["exo"])
+            if metadata.get("format") != STORAGE_FORMAT or metadata["key"] != list(key):
+                return None
+            entry = _Entry({})
+            entry.tensors = load_file(path)
+            entry.values = metadata["values"]
+            entry.restore = {name: (getattr(torch, dtype), torch.device(device)) for name, (dtype, device) in metadata["restore"].items()}
+            entry.nbytes = sum(t.numel() * t.element_size() for t in entry.tensors.values())
+            os.utime(path)
+            return entry
+        except Exception as e:
+            print(f"\033[93mIgnoring unreadable CLIP cache file {os.path.basename(path)}: {e}\033[0m")
+            return None
+
+    def _write_disk(self, key, entry):
+        from safetensors.torch import save_file
+        try:
+            json.dumps(entry.values)
+        except (TypeError, ValueError):
+            # Outputs with values safetensors metadata can't hold stay in memory only
+            return
+        metadata = {
+            "format": STORAGE_FORMAT,
+            "key": list(key),
+            "values": entry.values,
+            "restore": {name: (str(dtype).replace("torch.", ""), str(device)) for name, (dtype, device) in entry.restore.items()},
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, self._file_name(key))
+            temp_path = f"{path}.tmp{os.getpid()}"
+            save_file(entry.tensors, temp_path, metadata={"exo": json.dumps(metadata)})
+            os.replace(temp_path, path)
+            self._prune_disk()
+        except OSError as e:
+            print(f"\033[93mCould not write the CLIP cache to disk: {e}\033[0m")
+
+    def _prune_disk(self):
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".safetensors"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Empty the memory tier and reset the counters."""
+        super().clear()
+        with self._lock:
+            self.disk_hits = 0
+
+    def get_stats(self):
+        """Return the hit/miss counters and the size of the memory tier."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "memory_budget_bytes": self.budget,
+            }
+
+
+def _map_tensors(value, function):
+    """Apply function to every tensor in a nested encode output (tuples, lists and dicts)."""
+    if isinstance(value, torch.Tensor):
+        return function(value)
+    if isinstance(value, dict):
+        return {key: _map_tensors(item, function) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return type(value)(_map_tensors(item, function) for item in value)
+    return value
+
+
+class ChunkCache(LRUCache):
+    """
+    LRU of text encoder outputs for single token chunks, bounded by memory_budget_mb.
+    Outputs are kept on the CPU in their original precision, because prompt weights are applied to them afterwards.
+    """
+
+    def __init__(self, memory_budget_mb=DEFAULT_CHUNK_BUDGET_MB):
+        super().__init__(memory_budget_mb)
+
+    def get(self, key):
+        """Return a copy of the cached chunk output for key, on the device it was encoded on, or None."""
+        cached = self.lookup(key)
+        if cached is None:
+            return None
+        output, devices = cached
+        device_iter = iter(devices)
+        return _map_tensors(output, lambda tensor: tensor.to(next(device_iter), copy=True))
+
+    def put(self, key, output):
+        devices = []
+        sizes = []
+
+        def copy_to_cpu(tensor):
+            devices.append(tensor.device)
+            sizes.append(tensor.numel() * tensor.element_size())
+            return tensor.detach().to("cpu", copy=True)
+
+        stored = _map_tensors(output, copy_to_cpu)
+        self.store(key, (stored, devices), sum(sizes))
+
+
+# Caches shared by every node instance
+conditioning_cache = ConditioningCache()
+chunk_cache = ChunkCache()
+
+
+def get_stats():
+    """Return the statistics of the shared conditioning and chunk caches."""
+    stats = conditioning_cache.get_stats()
+    stats["chunks"] = chunk_cache.get_stats()
+    return stats
@@ -0,0 +1,145 @@
+# 
+# flux_noise.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+flux_noise.py
+-----------------------------
+The Flux Noise module provides the noise generator used by the EXO FluxSampler Node (NOISE output).
+
+Features:
+- Standard Noise: The whole latent batch is generated from one seed, exactly like ComfyUI's RandomNoise.
+- Sweep Noise: Every batch element gets its own seed, noise_seed + k * increment_value, so each element of a sweep batch matches a single image run with that seed. Consecutive elements can share a seed (group_size) when a seed is crossed with other parameters.
+- Parallel Generation: Batch elements with their own seeds are independent, so they are generated on a thread pool, each with its own generator, straight into one preallocated tensor. The result is bit-identical to generating them one after another; elements sharing a seed are generated once.
+- Noise Cache: Generated noise is kept in a least recently used cache with a byte budget (see lru_cache), keyed by seed(s), shape, dtype and batch_index. Re-queuing the same seed and resolution with other guidance or steps skips noise generation; every use gets its own copy.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import comfy.sample
+
+from .lru_cache import LRUCache
+
+# Threads used to generate per-element noise
+NOISE_THREADS = min(8, os.cpu_count() or 1)
+
+# Default byte budget of the noise cache
+DEFAULT_NOISE_CACHE_MB = 512
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _noise_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=NOISE_THREADS, thread_name_prefix="EXONoise")
+        return _executor
+
+
+def generate_seeded_noise(latent_image, seeds, threads=NOISE_THREADS):
+    """
+    Generate noise shaped like latent_image where element i is drawn from its own generator seeded with seeds[i].
+    Element i equals comfy.sample.prepare_noise(latent_image[i:i + 1], seeds[i]) bit for bit.
+    """
+    noise = torch.empty(
+        [len(seeds)] + list(latent_image.size())[1:],
+        dtype=latent_image.dtype, layout=latent_image.layout, device="cpu",
+    )
+    first_index = {}
+    for index, seed in enumerate(seeds):
+        first_index.setdefault(seed, index)
+
+    def fill(index):
+        generator = torch.Generator(device="cpu").manual_seed(seeds[index])
+        torch.randn(noise[index:index + 1].size(), generator=generator, out=noise[index:index + 1])
+
+    unique = list(first_index.values())
+    if threads > 1 and len(unique) > 1:
+        # torch releases the GIL while generating, so the elements are filled in parallel
+        list(_noise_executor().map(fill, unique))
+    else:
+        for index in unique:
+            fill(index)
+
+    for index, seed in enumerate(seeds):
+        if first_index[seed] != index:
+            noise[index].copy_(noise[first_index[seed]])
+    return noise
+
+
+class NoiseCache(LRUCache):
+    """LRU of generated noise tensors bounded by budget_mb. Every use gets a copy, so cached noise is never modified."""
+
+    def __init__(self, budget_mb=DEFAULT_NOISE_CACHE_MB):
+        super().__init__(budget_mb)
+
+    def get_or_create(self, key, create):
+        """Return a copy of the noise cached under key, calling create() to generate it on a miss."""
+        noise = self.lookup(key)
+        if noise is not None:
+            return noise.clone()
+
+        noise = create()
+        if self.store(key, noise, noise.numel() * noise.element_size(), replace=False):
+            return noise.clone()
+        return noise
+
+
+# Cache shared by every noise generator
+noise_cache = NoiseCache()
+
+
+class NoiseGenerator:
+    """
+    NOISE object for the sampler.
+    With increment_value None the batch is generated from one seed; otherwise element i uses
+    seed + (i // group_size) * increment_value.
+    """
+
+    def __init__(self, seed, increment_value=None, group_size=1):
+        self.seed = seed
+        self.increment_value = increment_value
+        self.group_size = max(1, group_size)
+
+    def element_seed(self, index):
+        """The seed used for batch element index in sweep mode."""
+        return (self.seed + (index // self.group_size) * self.increment_value) & 0xffffffffffffffff
+
+    def generate_noise(self, input_latent):
+        latent_image = input_latent["samples"]
+        batch_inds = input_latent["batch_index"] if "batch_index" in input_latent else None
+        key = (tuple(latent_image.shape), latent_image.dtype, latent_image.layout)
+        if self.increment_value is None:
+            key += ("seed", self.seed, tuple(int(i) for i in batch_inds) if batch_inds is not None else None)
+            return noise_cache.get_or_create(key, lambda: comfy.sample.prepare_noise(latent_image, self.seed, batch_inds))
+
+        # Latents picked from a batch keep the seed of their original position
+        indexes = batch_inds if batch_inds is not None else range(latent_image.shape[0])
+        seeds = [self.element_seed(index) for index in indexes]
+        return noise_cache.get_or_create(key + ("seeds", tuple(seeds)), lambda: generate_seeded_noise(latent_image, seeds))
@@ -0,0 +1,228 @@
+# 
+# flux_sampling.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+flux_sampling.py
+-----------------------------
+The Flux Sampling module is used with the EXO FluxSampler and EXO FluxSampler Mini Nodes to patch a model with ModelSamplingFlux for a given resolution.
+
+Features:
+- Shared Sampling Class: ModelSamplingAdvanced is defined once instead of on every call.
+- Sampling Cache: Sampling objects are reused per model config and shift.
+- Patched Model Cache: Patched clones are remembered per input model, resolution and shift settings with weak references, so running again at the same resolution returns the same patched model without cloning, while models no longer used by ComfyUI are freed as usual.
+- Guidance Sweep: A model wrapper that gives every element of a sweep batch its own Flux guidance value, so a grid of guidance values renders in one sampler pass.
+- Sigma Cache: Sigma schedules are cached by (sampling object, scheduler, steps, denoise). With denoise below 1, the simple, normal and sgm_uniform schedulers only compute the steps that are kept instead of the whole steps/denoise schedule.
+"""
+
+import math
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import torch
+import comfy.samplers
+import comfy.model_sampling
+
+# Resolution range (in 16x16 latent patches) that max_shift and base_shift refer to
+BASE_SEQ_LEN = 256
+MAX_SEQ_LEN = 4096
+
+# Sampling objects kept per model config
+MAX_SAMPLINGS_PER_CONFIG = 16
+
+# Sigma schedules kept in the sigma cache
+MAX_CACHED_SIGMAS = 64
+
+
+class ModelSamplingAdvanced(comfy.model_sampling.ModelSamplingFlux, comfy.model_sampling.CONST):
+    pass
+
+
+# model_config -> OrderedDict of shift -> sampling object
+_samplings = weakref.WeakKeyDictionary()
+# input model -> {(patches_uuid, width, height, max_shift, base_shift): weakref to the patched clone}
+_patched_models = weakref.WeakKeyDictionary()
+# (sampling fingerprint, scheduler, steps, denoise) -> sigmas
+_sigmas = OrderedDict()
+_lock = threading.Lock()
+
+
+def flux_shift(width, height, max_shift, base_shift):
+    """Interpolate the Flux shift for an image size between base_shift (256 patches) and max_shift (4096 patches)."""
+    mm = (max_shift - base_shift) / (MAX_SEQ_LEN - BASE_SEQ_LEN)
+    b = base_shift - mm * BASE_SEQ_LEN
+    return (width * height / (8 * 8 * 2 * 2)) * mm + b
+
+
+def get_model_sampling(model_config, shift):
+    """Return a ModelSamplingAdvanced for the model config with the given shift, reusing earlier ones."""
+    with _lock:
+        samplings = _samplings.get(model_config)
+        if samplings is None:
+            samplings = _samplings[model_config] = OrderedDict()
+        model_sampling = samplings.get(shift)
+        if model_sampling is not None:
+            samplings.move_to_end(shift)
+            return model_sampling
+
+    model_sampling = ModelSamplingAdvanced(model_config)
+    model_sampling.set_parameters(shift=shift)
+    with _lock:
+        samplings[shift] = model_sampling
+        while len(samplings) > MAX_SAMPLINGS_PER_CONFIG:
+            samplings.popitem(last=False)
+    return model_sampling
+
+
+def patch_model(model, width, height, max_shift, base_shift):
+    """
+    Return a clone of model patched with Flux sampling for the given resolution.
+    The same input model and settings return the same clone as long as it is still alive.
+    """
+    key = (getattr(model, "patches_uuid", None), width, height, max_shift, base_shift)
+    with _lock:
+        patched = _patched_models.get(model, {}).get(key)
+        patched = patched() if patched is not None else None
+    if patched is not None:
+        return patched
+
+    model_sampling = get_model_sampling(model.model.model_config, flux_shift(width, height, max_shift, base_shift))
+    patched = model.clone()
+    patched.add_object_patch("model_sampling", model_sampling)
+    with _lock:
+        clones = _patched_models.setdefault(model, {})
+        # Drop entries whose clones were freed
+        for dead in [k for k, ref in clones.items() if ref() is None]:
+            del clones[dead]
+        clones[key] = weakref.ref(patched)
+    return patched
+
+
+def apply_guidance_sweep(model, guidance_values):
+    """
+    Return a clone of model where batch element i is sampled with guidance_values[i % len(guidance_values)].
+    The Flux guidance is set per element through a unet function wrapper; other wrappers keep working.
+    """
+    m = model.clone()
+    previous = m.model_options.get("model_function_wrapper")
+    values = torch.FloatTensor(guidance_values)
+
+    def guidance_sweep(apply_model, args):
+        c = args["c"]
+        guidance = c.get("guidance")
+        batch = args["input"].shape[0]
+        # Conds and unconds are concatenated along the batch, each covering the whole latent batch
+        if isinstance(guidance, torch.Tensor) and guidance.shape[:1] == (batch,) and batch % len(values) == 0:
+            c = dict(c)
+            c["guidance"] = values.repeat(batch // len(values)).to(guidance)
+            args = dict(args, c=c)
+        if previous is not None:
+            return previous(apply_model, args)
+        return apply_model(args["input"], args["timestep"], **args["c"])
+
+    m.set_model_unet_function_wrapper(guidance_sweep)
+    return m
+
+
+def sampling_fingerprint(model_sampling):
+    """Identify a sampling object by its class and its sigma table, so equal samplings share cache entries."""
+    digest = hashlib.sha256(f"{type(model_sampling).__module__}.{type(model_sampling).__qualname__}".encode())
+    for name in ("shift", "multiplier", "sigma_data"):
+        digest.update(repr(getattr(model_sampling, name, None)).encode())
+    sigmas = getattr(model_sampling, "sigmas", None)
+    if isinstance(sigmas, torch.Tensor):
+        digest.update(sigmas.detach().float().cpu().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _simple_tail(model_sampling, total_steps, steps):
+    # Same values as comfy.samplers.simple_scheduler(model_sampling, total_steps)[-(steps + 1):]
+    sigmas = model_sampling.sigmas
+    ss = len(sigmas) / total_steps
+    sigs = [float(sigmas[-(1 + int(x * ss))]) for x in range(total_steps - steps, total_steps)]
+    sigs += [0.0]
+    return torch.FloatTensor(sigs)
+
+
+def _normal_tail(model_sampling, total_steps, steps, sgm=False):
+    # Same values as comfy.samplers.normal_scheduler(model_sampling, total_steps, sgm)[-(steps + 1):]
+    s = model_sampling
+    start = s.timestep(s.sigma_max)
+    end = s.timestep(s.sigma_min)
+    append_zero = True
+    if sgm:
+        timesteps = torch.linspace(start, end, total_steps + 1)[:-1]
+    else:
+        if math.isclose(float(s.sigma(end)), 0, abs_tol=0.00001):
+            total_steps += 1
+            append_zero = False
+        timesteps = torch.linspace(start, end, total_steps)
+    # Only the kept timesteps are converted to sigmas
+    keep = steps if append_zero else steps + 1
+    sigs = [float(s.sigma(ts)) for ts in timesteps[len(timesteps) - keep:]]
+    if append_zero:
+        sigs += [0.0]
+    return torch.FloatTensor(sigs)
+
+
+# Schedulers whose kept steps can be computed without the discarded ones
+TAIL_SCHEDULERS = {
+    "simple": _simple_tail,
+    "normal": _normal_tail,
+    "sgm_uniform": lambda model_sampling, total_steps, steps: _normal_tail(model_sampling, total_steps, steps, sgm=True),
+}
+
+
+def calculate_sigmas(model_sampling, scheduler, steps, denoise=1.0):
+    """
+    Return the sigmas for steps sampling steps at the given denoise, as comfy.samplers.calculate_sigmas
+    followed by keeping the last steps + 1 values when denoise < 1.
+    Results are cached; a new tensor is returned every time.
+    """
+    if denoise <= 0.0:
+        return torch.FloatTensor([])
+
+    key = (sampling_fingerprint(model_sampling), scheduler, steps, denoise)
+    with _lock:
+        sigmas = _sigmas.get(key)
+        if sigmas is not None:
+            _sigmas.move_to_end(key)
+            return sigmas.clone()
+
+    if denoise < 1.0:
+        total_steps = int(steps / denoise)
+        if scheduler in TAIL_SCHEDULERS:
+            sigmas = TAIL_SCHEDULERS[scheduler](model_sampling, total_steps, steps)
+        else:
+            sigmas = comfy.samplers.calculate_sigmas(model_sampling, scheduler, total_steps).cpu()[-(steps + 1):]
+    else:
+        sigmas = comfy.samplers.calculate_sigmas(model_sampling, scheduler, steps).cpu()
+
+    with _lock:
+        _sigmas[key] = sigmas
+        while len(_sigmas) > MAX_CACHED_SIGMAS:
+            _sigmas.popitem(last=False)
+    return sigmas.clone()
@@ -29,29 +29,36 @@ functions.py
 The EXO Functions module is a versatile collection of utility functions designed to support various operations within ComfyUI workflows. This module includes a range of functions for image processing, data manipulation, and computational tasks, providing essential tools for enhancing workflow efficiency and functionality.
 """
 
+import os
+import tempfile
 import torch
 import numpy as np
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # PIL to Tensor
-def pil2tensor(image):
-    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0)
+def pil2tensor(image, out=None):
+    # Scaled to 0-1 in place; with out (shaped like the image) the pixels are written into that buffer
+    pixels = torch.from_numpy(np.array(image))
+    if out is None:
+        return pixels.float().div_(255.0).unsqueeze(0)
+    return out.copy_(pixels).div_(255.0)
 
 # Tensor to PIL
 def tensor2pil(image):
-    return Image.fromarray(np.clip(255.0 * image.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
+    return Image.fromarray(images_to_uint8(image).numpy().squeeze())
 
-def apply_rescale_image(image: Image.Image, original_width, original_height, rounding_modulus, mode='resize', force_resize=False, supersample_aa='true', factor: float = 2.0, width: int = 1024, height: int = 1024, resample='bicubic', progress_callback=None):
-    # Define a dictionary of resampling filters
-    resample_filters = {'nearest': Image.NEAREST, 'bilinear': Image.BILINEAR, 'bicubic': Image.BICUBIC, 'lanczos': Image.LANCZOS}
+# Float 0-1 images to uint8 0-255 (clipped and truncated like the PIL conversion), one pass for a whole batch
+def images_to_uint8(images):
+    return torch.mul(images.detach().cpu(), 255.0).clamp_(0, 255).to(torch.uint8)
 
-    def resize_with_progress(img, target_size, resample_filter, steps=10):
-        if progress_callback:
-            # Perform resize in chunks and update progress
-            for _ in range(steps):
-                progress_callback.update(1)
-        return img.resize(target_size, resample=resample_filter)
+# uint8 0-255 images back to float 0-1, into out when given
+def uint8_to_images(pixels, out=None):
+    if out is None:
+        return pixels.float().div_(255.0)
+    return out.copy_(pixels).div_(255.0)
 
+def calculate_target_size(original_width, original_height, mode, force_resize=False, factor: float = 2.0, width: int = 1024, height: int = 1024):
     # Calculate the new width and height based on the given mode and parameters
     if mode == 'Upscale':
         new_width, new_height = int(original_width * factor), int(original_height * factor)
@@ -70,27 +77,264 @@ def apply_rescale_image(image: Image.Image, original_width, original_height, rou
                 new_height = int(width / aspect_ratio)
     else:
         raise ValueError(f"Invalid mode: {mode}")
+    return max(1, new_width), max(1, new_height)
+
+# Supersampling: scale of the intermediate image, default memory cap of the pyramid and tiled modes
+SUPERSAMPLE_FACTOR = 8
+DEFAULT_SUPERSAMPLE_MEMORY_MB = 512
+
+# PIL resampling filters and their support radius in source pixels
+RESAMPLE_FILTERS = {'nearest': Image.NEAREST, 'bilinear': Image.BILINEAR, 'bicubic': Image.BICUBIC, 'lanczos': Image.LANCZOS}
+FILTER_SUPPORT = {'nearest': 1, 'bilinear': 1, 'bicubic': 2, 'lanczos': 3}
+
+def supersample_factor(new_width, new_height, bytes_per_pixel, memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Largest power of two up to SUPERSAMPLE_FACTOR whose intermediate image fits in memory_mb
+    budget = memory_mb * 1024 * 1024
+    scale = SUPERSAMPLE_FACTOR
+    while scale > 1 and new_width * scale * new_height * scale * bytes_per_pixel > budget:
+        scale //= 2
+    return scale
+
+def pyramid_resize(image: Image.Image, new_width, new_height, resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, progress_callback=None):
+    # Supersample to the largest scale that fits memory_mb, then halve step by step down to the target size.
+    # Every resize is one progress step.
+    resample_filter = RESAMPLE_FILTERS[resample.lower()]
+    scale = supersample_factor(new_width, new_height, len(image.getbands()), memory_mb)
+    image = image.resize((new_width * scale, new_height * scale), resample=resample_filter)
+    if progress_callback:
+        progress_callback.update(1)
+    while scale > 1:
+        scale //= 2
+        image = image.resize((new_width * scale, new_height * scale), resample=resample_filter)
+        if progress_callback:
+            progress_callback.update(1)
+    return image
+
+def strip_rows(new_width, bytes_per_pixel, resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Output rows per strip of tiled_supersample and the extra intermediate rows read above and below each strip
+    pad = FILTER_SUPPORT[resample.lower()] * SUPERSAMPLE_FACTOR + 2
+    bytes_per_row = new_width * SUPERSAMPLE_FACTOR * bytes_per_pixel
+    return max(1, (memory_mb * 1024 * 1024 // bytes_per_row - 2 * pad) // SUPERSAMPLE_FACTOR), pad
+
+def tiled_supersample(image: Image.Image, new_width, new_height, resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, progress_callback=None):
+    # Same result as the 8x supersample, computed in horizontal strips of the intermediate image.
+    # Each strip covers its output rows plus the rows the downscale filter reads around them,
+    # and is written straight into the output image. Every strip is one progress step.
+    resample_filter = RESAMPLE_FILTERS[resample.lower()]
+    scale = SUPERSAMPLE_FACTOR
+    ss_width, ss_height = new_width * scale, new_height * scale
+    source_width, source_height = image.size
+    rows_per_strip, pad = strip_rows(new_width, len(image.getbands()), resample, memory_mb)
+
+    output = Image.new(image.mode, (new_width, new_height))
+    for top in range(0, new_height, rows_per_strip):
+        bottom = min(new_height, top + rows_per_strip)
+        ss_top = max(0, top * scale - pad)
+        ss_bottom = min(ss_height, bottom * scale + pad)
+        # The strip rows of the full intermediate image, resampled from the whole source
+        strip = image.resize(
+            (ss_width, ss_bottom - ss_top),
+            resample=resample_filter,
+            box=(0, ss_top * source_height / ss_height, source_width, ss_bottom * source_height / ss_height)
+        )
+        output.paste(strip.resize(
+            (new_width, bottom - top),
+            resample=resample_filter,
+            box=(0, top * scale - ss_top, ss_width, bottom * scale - ss_top)
+        ), (0, top))
+        if progress_callback:
+            progress_callback.update(1)
+    return output
+
+def rescale_steps(new_width, new_height, bytes_per_pixel, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Number of progress steps apply_rescale_image reports for one image
+    if supersample_aa == 'tiled':
+        rows_per_strip, _ = strip_rows(new_width, bytes_per_pixel, resample, memory_mb)
+        return -(-new_height // rows_per_strip)
+    if supersample_aa == 'pyramid':
+        return supersample_factor(new_width, new_height, bytes_per_pixel, memory_mb).bit_length()
+    return 2 if supersample_aa == 'true' else 1
+
+def intermediate_bytes(new_width, new_height, bytes_per_pixel, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Size of the largest intermediate image apply_rescale_image allocates for one image (0 without supersampling)
+    if supersample_aa == 'tiled':
+        rows_per_strip, pad = strip_rows(new_width, bytes_per_pixel, resample, memory_mb)
+        rows = min(new_height * SUPERSAMPLE_FACTOR, rows_per_strip * SUPERSAMPLE_FACTOR + 2 * pad)
+        return rows * new_width * SUPERSAMPLE_FACTOR * bytes_per_pixel
+    if supersample_aa == 'pyramid':
+        scale = supersample_factor(new_width, new_height, bytes_per_pixel, memory_mb)
+        return new_width * scale * new_height * scale * bytes_per_pixel
+    if supersample_aa == 'true':
+        return new_width * SUPERSAMPLE_FACTOR * new_height * SUPERSAMPLE_FACTOR * bytes_per_pixel
+    return 0
+
+def apply_rescale_image(image: Image.Image, original_width, original_height, rounding_modulus, mode='resize', force_resize=False, supersample_aa='true', factor: float = 2.0, width: int = 1024, height: int = 1024, resample='bicubic', progress_callback=None, memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Progress is reported once per completed unit of work (see rescale_steps)
+    # Define a dictionary of resampling filters
+    resample_filters = RESAMPLE_FILTERS
+
+    def resize_with_progress(img, target_size, resample_filter):
+        resized = img.resize(target_size, resample=resample_filter)
+        if progress_callback:
+            progress_callback.update(1)
+        return resized
+
+    new_width, new_height = calculate_target_size(original_width, original_height, mode, force_resize, factor, width, height)
+
+    # Memory-bounded anti-aliasing modes
+    if supersample_aa == 'tiled':
+        return tiled_supersample(image, new_width, new_height, resample, memory_mb, progress_callback)
+    if supersample_aa == 'pyramid':
+        return pyramid_resize(image, new_width, new_height, resample, memory_mb, progress_callback)
 
     # Apply supersample with progress updates
     if supersample_aa == 'true':
         # Ensure dimensions are valid
-        ss_width = max(1, new_width * 8)
-        ss_height = max(1, new_height * 8)
+        ss_width = max(1, new_width * SUPERSAMPLE_FACTOR)
+        ss_height = max(1, new_height * SUPERSAMPLE_FACTOR)
         
         # Perform supersampling with progress updates
         image = resize_with_progress(
             image, 
             (ss_width, ss_height), 
-            resample_filters[resample.lower()], 
-            steps=10
+            resample_filters[resample.lower()]
         )
 
     # Perform final resize with progress updates
     resized_image = resize_with_progress(
         image, 
         (new_width, new_height), 
-        resample_filters[resample.lower()], 
-        steps=10
+        resample_filters[resample.lower()]
     )
 
-    return resized_image
\ No newline at end of file
+    return resized_image
+
+# Default number of threads used to resize the frames of a batch with PIL
+DEFAULT_RESIZE_WORKERS = os.cpu_count() or 1
+
+def rescale_pil_batch(images: torch.Tensor, workers=0, progress_callback=None, out=None, **rescale_args):
+    # Rescale every frame of a [B,H,W,C] batch with apply_rescale_image.
+    # The batch is converted to uint8 once, frames stay uint8 through PIL and are written into one preallocated
+    # uint8 tensor that is converted back to float once.
+    # PIL releases the GIL while resizing, so frames run concurrently on up to workers threads (0 = one per CPU).
+    # With supersampling, every thread holds its own intermediate image, so the threads are also limited to as many
+    # intermediates as fit in memory_mb (at least one). progress_callback.update is then called from the worker threads. If it raises (e.g. on interrupt),
+    # frames that have not started are cancelled and the error is raised here.
+    # With out (a float tensor of the output shape) the result is written into it instead of a new tensor.
+    pixels = images_to_uint8(images).numpy()
+
+    def rescale(index):
+        pil_img = Image.fromarray(pixels[index].squeeze())
+        resized = apply_rescale_image(pil_img, pil_img.size[0], pil_img.size[1], rounding_modulus=8, progress_callback=progress_callback, **rescale_args)
+        return torch.from_numpy(np.array(resized))
+
+    # The first frame gives the output size
+    first = rescale(0)
+    output = torch.empty((len(images),) + tuple(first.shape), dtype=torch.uint8)
+    output[0] = first
+    frame_bytes = intermediate_bytes(first.shape[1], first.shape[0], pixels.shape[-1],
+                                     rescale_args.get('supersample_aa', 'true'), rescale_args.get('resample', 'bicubic'),
+                                     rescale_args.get('memory_mb', DEFAULT_SUPERSAMPLE_MEMORY_MB))
+    workers = min(len(images), workers if workers > 0 else DEFAULT_RESIZE_WORKERS)
+    if frame_bytes:
+        workers = min(workers, max(1, rescale_args.get('memory_mb', DEFAULT_SUPERSAMPLE_MEMORY_MB) * 1024 * 1024 // frame_bytes))
+    if workers <= 1:
+        for index in range(1, len(images)):
+            output[index] = rescale(index)
+        return uint8_to_images(output, out)
+
+    def rescale_into(index):
+        output[index] = rescale(index)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="EXORescale") as executor:
+        futures = [executor.submit(rescale_into, index) for index in range(1, len(images))]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return uint8_to_images(output, out)
+
+# Torch interpolate modes for the resampling methods; torch has no Lanczos, antialiased bicubic is the closest
+TORCH_RESAMPLE_MODES = {'nearest': 'nearest-exact', 'bilinear': 'bilinear', 'bicubic': 'bicubic', 'lanczos': 'bicubic'}
+
+def torch_rescale_steps(new_width, new_height, batch_size, channels, supersample_aa='true', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Number of interpolate calls (progress steps) of torch_rescale_image
+    if supersample_aa in ('pyramid', 'tiled'):
+        return supersample_factor(new_width, new_height, batch_size * channels * 4, memory_mb).bit_length()
+    return 2 if supersample_aa == 'true' else 1
+
+def torch_rescale_image(images: torch.Tensor, mode='resize', force_resize=False, supersample_aa='true', factor: float = 2.0, width: int = 1024, height: int = 1024, resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, progress_callback=None, out=None):
+    # Resize a whole [B,H,W,C] image batch in one interpolate call, without converting to PIL.
+    # Every interpolate call is one progress step (see torch_rescale_steps). With out the result is copied into it.
+    original_height, original_width = images.shape[1], images.shape[2]
+    new_width, new_height = calculate_target_size(original_width, original_height, mode, force_resize, factor, width, height)
+    interpolate_mode = TORCH_RESAMPLE_MODES[resample.lower()]
+    antialias = interpolate_mode in ('bilinear', 'bicubic')
+
+    def interpolate(samples, scale):
+        samples = torch.nn.functional.interpolate(samples, size=(new_height * scale, new_width * scale), mode=interpolate_mode, antialias=antialias)
+        if progress_callback:
+            progress_callback.update(1)
+        return samples
+
+    samples = images.movedim(-1, 1).float()
+    if supersample_aa == 'true':
+        samples = interpolate(samples, SUPERSAMPLE_FACTOR)
+    elif supersample_aa in ('pyramid', 'tiled'):
+        # Capped pyramid for the whole batch (float32 samples); interpolate has no source box for strips
+        scale = supersample_factor(new_width, new_height, samples.shape[0] * samples.shape[1] * 4, memory_mb)
+        while scale > 1:
+            samples = interpolate(samples, scale)
+            scale //= 2
+    samples = interpolate(samples, 1)
+    # Bicubic overshoots; clamp like the 8-bit PIL path does
+    samples = samples.clamp_(0.0, 1.0).movedim(1, -1)
+    if out is not None:
+        return out.copy_(samples)
+    return samples.contiguous()
+
+def streaming_output(shape, directory=None):
+    # A float32 image tensor backed by a memory-mapped file in directory, so it lives on disk rather than in RAM.
+    # The file is removed right away where the OS allows it (the mapping stays valid); elsewhere it is left in directory.
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(prefix="exo_rescale_", suffix=".f32", dir=directory, delete=False) as file:
+        path = file.name
+    mapped = np.memmap(path, dtype=np.float32, mode="w+", shape=tuple(shape))
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return torch.from_numpy(mapped)
+
+def stream_rescale(images: torch.Tensor, rescale_window, window_size=16, memory_mapped=False, directory=None):
+    # Rescale a long [B,H,W,C] sequence window by window; rescale_window(frames, out) writes one window into out.
+    # Only one window of intermediate data exists at a time, and the output is preallocated in RAM or memory-mapped on disk.
+    window_size = max(1, window_size)
+    first = rescale_window(images[:window_size], None)
+    shape = (len(images),) + tuple(first.shape[1:])
+    output = streaming_output(shape, directory) if memory_mapped else torch.empty(shape, dtype=torch.float32)
+    output[:len(first)] = first
+    del first
+    for start in range(window_size, len(images), window_size):
+        window = output[start:start + window_size]
+        rescale_window(images[start:start + window_size], window)
+    return output
+
+# Text helpers
+def ensure_utf8(text):
+    # Ensure proper UTF-8 encoding to handle special characters
+    if isinstance(text, bytes):
+        return text.decode('utf-8')
+    elif isinstance(text, str):
+        return text.encode('utf-8').decode('utf-8')
+    return text
+
+def list_item(values, index, default):
+    # Item index of a list input (INPUT_IS_LIST nodes); shorter lists repeat their last value, like ComfyUI does
+    if not values:
+        return default
+    return values[min(index, len(values) - 1)]
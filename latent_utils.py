@@ -0,0 +1,198 @@
+# 
+# latent_utils.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+latent_utils.py
+-----------------------------
+The Latent Utils module is used with the EXO Latent Image Size and EXO Latent Image Size X Nodes to turn dimension strings into sizes and to create empty latents.
+
+Features:
+- Dimension Table: The "width x height (aspect ratio)" strings from Latent_Image_Size_config.json are parsed once at import into a lookup table.
+- Resolution and Batch Planner: Computes a VAE-aligned width and height for an aspect ratio and megapixel count, and the largest batch size that fits a memory budget. With a model, the memory per sample is the model's own estimate for its latent shape and dtype (as ComfyUI uses before sampling), and the free device memory is reduced by the model weights that are not loaded yet. Without a model, a per-megapixel estimate and an explicit budget are needed.
+- Shared Zero Latents: An empty latent can be returned as a single cached zero value expanded (stride 0) to the full batch shape, so it takes no memory however large the batch is. Samplers only read the empty latent and copy it when moving it to the device; a node that writes into the latent in place gets an error instead of a silent change, so Allocate mode stays the default.
+"""
+
+import math
+import threading
+
+import torch
+from nodes import EmptyLatentImage
+
+# Latent creation modes for the latent size nodes
+LATENT_MODES = ["Allocate", "Shared Zeros"]
+
+# Planner settings: pixels per megapixel (as used by ComfyUI), alignment choices and largest batch
+PIXELS_PER_MEGAPIXEL = 1024 * 1024
+PLANNER_MODULI = ["8", "16", "64"]
+MAX_PLANNED_BATCH = 4096
+# Share of the free device memory the planner uses when no budget is given
+FREE_MEMORY_SHARE = 0.9
+# VAE downscale of the latent and the cond + uncond rows sampled per image, as ComfyUI estimates sampling memory
+LATENT_DOWNSCALE = 8
+ROWS_PER_SAMPLE = 2
+
+# Latent layout (channels, dtype, device) of EmptyLatentImage, probed on first use
+_latent_layout = None
+# (dtype, device) -> zero scalar that shared latents are expanded from
+_zeros = {}
+_lock = threading.Lock()
+
+
+def parse_dimensions(dimensions):
+    """
+    Parse a 'width x height (aspect ratio)' string.
+
+    Returns:
+        tuple: (width, height), or None for separator lines and blank entries
+    """
+    if dimensions.startswith('-----') or dimensions.strip() == "":
+        return None
+    # Ignore the aspect ratio label in parentheses
+    dimensions_part = dimensions.split('(')[0].strip()
+    result = [x.strip() for x in dimensions_part.split('x')]
+    return (int(result[0]), int(result[1]))
+
+
+def build_dimension_table(dimension_list):
+    """Parse every dimension string of the config into {dimensions: (width, height)}, skipping separators."""
+    table = {}
+    for dimensions in dimension_list:
+        try:
+            size = parse_dimensions(dimensions)
+        except (ValueError, IndexError):
+            print(f"\033[93mIgnoring invalid dimension setting '{dimensions}' in Latent_Image_Size_config.json\033[0m")
+            continue
+        if size is not None:
+            table[dimensions] = size
+    return table
+
+
+def lookup_dimensions(table, dimensions):
+    """
+    Return (width, height) for a dimension string, from the table or parsed when not in it
+    (e.g. a workflow saved with an entry that was since removed from the config).
+    """
+    size = table.get(dimensions)
+    if size is None:
+        size = parse_dimensions(dimensions)
+    if size is None:
+        raise ValueError("Please select a valid dimension setting, not a separator line")
+    return size
+
+
+def parse_aspect_ratio(aspect_ratio):
+    """Parse an aspect ratio given as "16:9", "16x9" or "1.78" into width / height."""
+    text = aspect_ratio.strip().lower().replace("x", ":").replace("/", ":")
+    try:
+        if ":" in text:
+            width, height = (float(part) for part in text.split(":", 1))
+        else:
+            width, height = float(text), 1.0
+    except ValueError:
+        raise ValueError(f"Invalid aspect ratio '{aspect_ratio}'. Use a format like 16:9 or 1.78.")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid aspect ratio '{aspect_ratio}'. Both sides must be greater than zero.")
+    return width / height
+
+
+def plan_resolution(aspect_ratio, megapixels, modulus):
+    """
+    Return the (width, height) closest to the aspect ratio and megapixel count with both sides a multiple of modulus.
+    """
+    ratio = parse_aspect_ratio(aspect_ratio)
+    pixels = megapixels * PIXELS_PER_MEGAPIXEL
+    width = max(modulus, int(round(math.sqrt(pixels * ratio) / modulus)) * modulus)
+    height = max(modulus, int(round(math.sqrt(pixels / ratio) / modulus)) * modulus)
+    return (width, height)
+
+
+def available_memory():
+    """Free memory in bytes on the device ComfyUI samples on."""
+    import comfy.model_management
+    return comfy.model_management.get_free_memory(comfy.model_management.get_torch_device())
+
+
+def sampling_memory(model, width, height):
+    """
+    Return (bytes per sample, bytes to reserve) for sampling model at width x height.
+    The per sample memory is the model's estimate for its latent channels and dtype; the reserve is the part of the
+    weights that is not on the device yet plus ComfyUI's minimum inference memory.
+    """
+    import comfy.model_management
+    base_model = model.model
+    latent_format = getattr(base_model, "latent_format", None)
+    channels = getattr(latent_format, "latent_channels", 4)
+    shape = [ROWS_PER_SAMPLE, channels, height // LATENT_DOWNSCALE, width // LATENT_DOWNSCALE]
+    per_sample = base_model.memory_required(shape)
+    loaded = model.loaded_size() if hasattr(model, "loaded_size") else 0
+    reserve = max(0, model.model_size() - loaded) + comfy.model_management.minimum_inference_memory()
+    return per_sample, reserve
+
+
+def plan_batch_size(width, height, memory_budget_gb, gb_per_megapixel, model=None):
+    """
+    Return the largest batch size whose estimated sampling memory fits the budget.
+    With a model, the memory per sample comes from sampling_memory; a budget of 0 then uses FREE_MEMORY_SHARE of
+    the free device memory less the memory the model still needs. Without a model, every sample megapixel is
+    estimated at gb_per_megapixel and the budget must be given, because the model weights can't be accounted for.
+    """
+    if model is not None:
+        per_sample, reserve = sampling_memory(model, width, height)
+    elif memory_budget_gb > 0:
+        per_sample, reserve = gb_per_megapixel * 1024 ** 3 * (width * height / PIXELS_PER_MEGAPIXEL), 0
+    else:
+        raise ValueError("The batch planner needs a model to size the batch from free memory. "
+                         "Connect the model, or set memory_budget_gb to the memory left for sampling.")
+    if memory_budget_gb > 0:
+        budget = memory_budget_gb * 1024 ** 3
+    else:
+        budget = available_memory() * FREE_MEMORY_SHARE - reserve
+    if per_sample <= 0:
+        return MAX_PLANNED_BATCH
+    return max(1, min(MAX_PLANNED_BATCH, int(budget // per_sample)))
+
+
+def shared_empty_latent(width, height, batch_size):
+    """
+    Return an empty latent like EmptyLatentImage().generate(width, height, batch_size), backed by one cached zero.
+    The samples tensor is read-only in practice: in-place writes raise an error because every element shares memory.
+    """
+    global _latent_layout
+    with _lock:
+        if _latent_layout is None:
+            probe = EmptyLatentImage().generate(8, 8, 1)[0]["samples"]
+            _latent_layout = (probe.shape[1], probe.dtype, probe.device)
+        channels, dtype, device = _latent_layout
+        zero = _zeros.get((dtype, device))
+        if zero is None:
+            zero = _zeros[(dtype, device)] = torch.zeros((), dtype=dtype, device=device)
+    return {"samples": zero.expand(batch_size, channels, height // 8, width // 8)}
+
+
+def empty_latent(width, height, batch_size, latent_mode="Allocate"):
+    """Create an empty latent, allocated by EmptyLatentImage or shared (see shared_empty_latent)."""
+    if latent_mode == "Shared Zeros":
+        return shared_empty_latent(width, height, batch_size)
+    return EmptyLatentImage().generate(width, height, batch_size)[0]
@@ -0,0 +1,112 @@
+# 
+# lru_cache.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+lru_cache.py
+-----------------------------
+The LRU Cache module provides the least recently used cache with a byte budget that the EXO nodes' in-memory caches are built on: the FluxSampler noise cache, the Image Rescale weight cache and the Clip Text Encode conditioning and chunk caches.
+
+Features:
+- Byte Budget: Every entry is stored with its size in bytes. An entry larger than the whole budget is not stored, and the least recently used entries are evicted while the cache is over budget.
+- Thread Safety: Lookups, inserts and evictions run under one lock, so the caches can be shared by node instances and worker threads.
+- Statistics: Hit and miss counters and the cache size, available from get_stats().
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by budget_mb. Subclasses decide what is stored (copies, CPU tensors)
+    and call lookup() and store() with the size of each value.
+    """
+
+    def __init__(self, budget_mb):
+        self.budget = budget_mb * 1024 * 1024
+        # key -> (value, size in bytes)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, key):
+        """True when key is cached; does not count as a lookup or mark the entry as used."""
+        with self._lock:
+            return key in self._entries
+
+    def lookup(self, key, count_miss=True):
+        """Return the value cached under key and mark it as most recently used, or None."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+    def store(self, key, value, nbytes, replace=True):
+        """
+        Cache value (nbytes in size) under key and evict the least recently used entries while over budget.
+        With replace False an entry already cached under key is kept. Returns False when value is larger than the budget.
+        """
+        if nbytes > self.budget:
+            return False
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                if not replace:
+                    return True
+                del self._entries[key]
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.budget:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+        return True
+
+    def clear(self):
+        """Empty the cache and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def get_stats(self):
+        """Return the hit/miss counters and the size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "memory_budget_bytes": self.budget,
+            }
@@ -0,0 +1,310 @@
+# 
+# rescale_backends.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+rescale_backends.py
+-----------------------------
+The Rescale Backends module is used with the EXO Image Rescale Node to resize image batches with different libraries. Every backend rescales a [B,H,W,C] image batch with the node's modes, resampling methods and supersample options.
+
+Backends:
+- PIL: The reference backend; frames are resized with PIL on a thread pool.
+- Torch: Resizes the whole batch with antialiased torch interpolate (Lanczos uses antialiased bicubic).
+- Separable: Resizes the whole batch with two passes of matrix multiplications with PIL's resampling weights, which are computed once per size and filter and cached (see separable_resize).
+- OpenCV: Resizes every frame with cv2.resize using the matching OpenCV filter. Requires the opencv-python package.
+
+Auto Selection (opt-in, PIL stays the default): The first time a resampling method is used for upscaling or downscaling with a supersample mode, a short benchmark runs the installed backends that can honour that filter and mode on a high-detail 8-bit test batch (Torch has no Lanczos, OpenCV's filters do not antialias when shrinking, and only PIL implements the per-frame pyramid and tiled modes; the others approximate them). The fastest backend whose every output pixel is within SELECTION_TOLERANCE 8-bit levels of PIL is chosen, and the choice is saved in rescale_backend_cache.json. The cache is only reused on the same host with the same library versions.
+"""
+
+import os
+import json
+import time
+import platform
+import threading
+import statistics
+from importlib.util import find_spec
+
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from .separable_resize import separable_rescale_image, separable_rescale_steps
+from .functions import (rescale_pil_batch, rescale_steps, torch_rescale_image, torch_rescale_steps,
+                        calculate_target_size, supersample_factor, SUPERSAMPLE_FACTOR, DEFAULT_SUPERSAMPLE_MEMORY_MB)
+
+# Auto selection: largest per-pixel difference to the PIL result in 8-bit levels, and the benchmark batch
+SELECTION_TOLERANCE = 1
+# Saved choices made by an older selection method are measured again
+SELECTION_VERSION = 3
+BENCHMARK_FRAMES = 4
+BENCHMARK_SIZE = 256
+# Smaller test frames for the 8x supersample, whose intermediate is 64 times the output
+BENCHMARK_SUPERSAMPLE_SIZE = 64
+BENCHMARK_REPEATS = 3
+
+# Backend choices of the auto selection, saved across restarts
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rescale_backend_cache.json")
+
+
+class RescaleBackend:
+    """Base class for rescale backends. Subclasses rescale a [B,H,W,C] float image batch."""
+    name = None
+    requires = ()
+
+    @classmethod
+    def is_available(cls):
+        """True when every package the backend needs is installed."""
+        return all(find_spec(module) is not None for module in cls.requires)
+
+    def supports(self, resample, scale_class, supersample_aa):
+        """True when the backend implements the resampling method and supersample mode for "Upscale" or "Downscale" (auto selection)."""
+        return True
+
+    def steps(self, target_size, batch_size, channels, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, **rescale_args):
+        """Number of progress steps rescale() reports for a batch."""
+        raise NotImplementedError
+
+    def rescale(self, images, out=None, progress_callback=None, workers=0, **rescale_args):
+        """Rescale images with the apply_rescale_image arguments, into out when given."""
+        raise NotImplementedError
+
+
+class PILBackend(RescaleBackend):
+    name = "PIL"
+
+    def steps(self, target_size, batch_size, channels, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, **rescale_args):
+        return rescale_steps(*target_size, channels, supersample_aa, resample, memory_mb) * batch_size
+
+    def rescale(self, images, out=None, progress_callback=None, workers=0, **rescale_args):
+        return rescale_pil_batch(images, workers=workers, progress_callback=progress_callback, out=out, **rescale_args)
+
+
+class TorchBackend(RescaleBackend):
+    name = "Torch"
+
+    def steps(self, target_size, batch_size, channels, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, **rescale_args):
+        return torch_rescale_steps(*target_size, batch_size, channels, supersample_aa, memory_mb)
+
+    def supports(self, resample, scale_class, supersample_aa):
+        # Lanczos is approximated with bicubic, and pyramid and tiled with a capped whole-batch pyramid
+        return resample.lower() != 'lanczos' and supersample_aa not in ('pyramid', 'tiled')
+
+    def rescale(self, images, out=None, progress_callback=None, workers=0, **rescale_args):
+        return torch_rescale_image(images, progress_callback=progress_callback, out=out, **rescale_args)
+
+
+class SeparableBackend(RescaleBackend):
+    name = "Separable"
+
+    def steps(self, target_size, batch_size, channels, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, **rescale_args):
+        return separable_rescale_steps(*target_size, batch_size, channels, supersample_aa, memory_mb)
+
+    def supports(self, resample, scale_class, supersample_aa):
+        # Pyramid and tiled are approximated with a capped whole-batch pyramid
+        return supersample_aa not in ('pyramid', 'tiled')
+
+    def rescale(self, images, out=None, progress_callback=None, workers=0, **rescale_args):
+        return separable_rescale_image(images, progress_callback=progress_callback, out=out, **rescale_args)
+
+
+class OpenCVBackend(RescaleBackend):
+    name = "OpenCV"
+    requires = ("cv2",)
+
+    def supports(self, resample, scale_class, supersample_aa):
+        # cv2.resize filters are not widened when shrinking, so downscales alias unlike PIL,
+        # and pyramid and tiled are approximated with a float32 pyramid per frame
+        return (scale_class == "Upscale" or resample.lower() == 'nearest') and supersample_aa not in ('pyramid', 'tiled')
+
+    def steps(self, target_size, batch_size, channels, supersample_aa='true', resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, **rescale_args):
+        # Frames are resized one at a time, like the torch path for a batch of one
+        return torch_rescale_steps(*target_size, 1, channels, supersample_aa, memory_mb) * batch_size
+
+    def rescale(self, images, out=None, progress_callback=None, workers=0, mode='resize', force_resize=False,
+                supersample_aa='true', factor=2.0, width=1024, height=1024, resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+        import cv2
+        filters = {'nearest': getattr(cv2, 'INTER_NEAREST_EXACT', cv2.INTER_NEAREST), 'bilinear': cv2.INTER_LINEAR,
+                   'bicubic': cv2.INTER_CUBIC, 'lanczos': cv2.INTER_LANCZOS4}
+        original_height, original_width, channels = images.shape[1], images.shape[2], images.shape[3]
+        new_width, new_height = calculate_target_size(original_width, original_height, mode, force_resize, factor, width, height)
+        if out is None:
+            out = torch.empty((len(images), new_height, new_width, channels), dtype=torch.float32)
+
+        def resize(frame, scale):
+            size = (new_width * scale, new_height * scale)
+            frame = cv2.resize(frame, size, interpolation=filters[resample.lower()]).reshape(size[1], size[0], channels)
+            if progress_callback:
+                progress_callback.update(1)
+            return frame
+
+        for index in range(len(images)):
+            frame = images[index].float().numpy()
+            if supersample_aa == 'true':
+                frame = resize(frame, SUPERSAMPLE_FACTOR)
+            elif supersample_aa in ('pyramid', 'tiled'):
+                # Capped pyramid per frame (float32), as in the torch path
+                scale = supersample_factor(new_width, new_height, channels * 4, memory_mb)
+                while scale > 1:
+                    frame = resize(frame, scale)
+                    scale //= 2
+            out[index] = torch.from_numpy(np.clip(resize(frame, 1), 0.0, 1.0))
+        return out
+
+
+# Dictionary mapping backend names to their classes; PIL is the reference of the auto selection
+RESCALE_BACKENDS = {
+    backend.name: backend for backend in (PILBackend, TorchBackend, SeparableBackend, OpenCVBackend)
+}
+REFERENCE_BACKEND = PILBackend.name
+AUTO_BACKEND = "Auto"
+DEFAULT_BACKEND = PILBackend.name
+
+_backends = {}
+_choices = None
+_lock = threading.Lock()
+
+
+def available_backends():
+    """Return the names of the backends whose packages are installed."""
+    return [name for name, backend in RESCALE_BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name):
+    """Return the shared instance of a backend."""
+    with _lock:
+        if name not in _backends:
+            _backends[name] = RESCALE_BACKENDS[name]()
+        return _backends[name]
+
+
+def host_fingerprint():
+    """Identify the host and library versions the auto selection was measured with."""
+    versions = {"torch": torch.__version__, "PIL": getattr(PILImage, "__version__", None)}
+    if OpenCVBackend.is_available():
+        import cv2
+        versions["cv2"] = cv2.__version__
+    return {"node": platform.node(), "machine": platform.machine(), "cpus": os.cpu_count(), "versions": versions,
+            "selection": SELECTION_VERSION}
+
+
+def _load_choices():
+    global _choices
+    if _choices is None:
+        _choices = {}
+        try:
+            with open(CACHE_PATH, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("host") == host_fingerprint():
+                _choices = cached.get("choices", {})
+        except (OSError, ValueError):
+            pass
+    return _choices
+
+
+def _save_choices():
+    try:
+        temp_path = f"{CACHE_PATH}.tmp{os.getpid()}"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"host": host_fingerprint(), "choices": _choices}, f, indent=4)
+        os.replace(temp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"\033[93mCould not save the rescale backend choices: {e}\033[0m")
+
+
+def benchmark_images(frames=BENCHMARK_FRAMES, size=BENCHMARK_SIZE):
+    """
+    A deterministic high-detail RGB test batch quantised to 8-bit: per-pixel noise, which exposes every
+    difference in filter shape, support and overshoot clipping.
+    """
+    generator = torch.Generator().manual_seed(0)
+    return torch.randint(0, 256, (frames, size, size, 3), generator=generator).float().div_(255.0)
+
+
+def benchmark_backends(resample, scale_class, supersample_aa='false', repeats=BENCHMARK_REPEATS):
+    """
+    Time every installed backend that supports the resampling method and supersample mode for "Upscale" or "Downscale"
+    on the test batch.
+
+    Returns:
+        dict: {backend name: {"seconds": median time, "error": largest per-pixel difference to PIL in 8-bit levels}}
+    """
+    images = benchmark_images(size=BENCHMARK_SIZE if supersample_aa == 'false' else BENCHMARK_SUPERSAMPLE_SIZE)
+    rescale_args = dict(mode=scale_class, factor=2.0, resample=resample, supersample_aa=supersample_aa)
+    reference = get_backend(REFERENCE_BACKEND).rescale(images, **rescale_args).mul(255.0).round_()
+    results = {}
+    for name in available_backends():
+        backend = get_backend(name)
+        if not backend.supports(resample, scale_class, supersample_aa):
+            continue
+        output = backend.rescale(images, **rescale_args)
+        error = (output.mul(255.0).round_() - reference).abs().max().item()
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            backend.rescale(images, **rescale_args)
+            timings.append(time.perf_counter() - start)
+        results[name] = {"seconds": statistics.median(timings), "error": error}
+    return results
+
+
+def scale_class(source_size, target_size):
+    """Return "Upscale" when the target has more pixels than the source, otherwise "Downscale"."""
+    return "Upscale" if target_size[0] * target_size[1] > source_size[0] * source_size[1] else "Downscale"
+
+
+def auto_backend_name(resample, source_size, target_size, supersample_aa='false'):
+    """
+    Return the backend the auto selection picked for a resampling method, scale class and supersample mode,
+    benchmarking the backends the first time they are needed.
+    """
+    scale = scale_class(source_size, target_size)
+    candidates = [name for name in available_backends() if get_backend(name).supports(resample, scale, supersample_aa)]
+    if candidates == [REFERENCE_BACKEND]:
+        # Nothing to compare, e.g. the pyramid and tiled modes only PIL implements
+        return REFERENCE_BACKEND
+    key = f"{resample}/{scale}/{supersample_aa}"
+    with _lock:
+        choice = _load_choices().get(key)
+    if choice in RESCALE_BACKENDS and RESCALE_BACKENDS[choice].is_available():
+        return choice
+
+    print(f"\033[94mBenchmarking resize backends for {resample} {scale.lower()} with supersample {supersample_aa} (one time only)...\033[0m")
+    results = benchmark_backends(resample, scale, supersample_aa)
+    matching = {name: result for name, result in results.items() if result["error"] <= SELECTION_TOLERANCE}
+    choice = min(matching, key=lambda name: matching[name]["seconds"]) if matching else REFERENCE_BACKEND
+    summary = ", ".join(f"{name} {result['seconds'] * 1000:.1f} ms (max error {result['error']:.0f})" for name, result in results.items())
+    print(f"\033[94mResize backend for {key}: {choice}   [{summary}]\033[0m")
+    with _lock:
+        _load_choices()[key] = choice
+        _save_choices()
+    return choice
+
+
+def select_backend(name, resample, source_size, target_size, supersample_aa='false'):
+    """Return the backend to use: the pinned one when installed, otherwise the auto selection."""
+    if name != AUTO_BACKEND:
+        if name in RESCALE_BACKENDS and RESCALE_BACKENDS[name].is_available():
+            return get_backend(name)
+        print(f"\033[93mResize backend '{name}' is not available, using automatic selection\033[0m")
+    return get_backend(auto_backend_name(resample, source_size, target_size, supersample_aa))
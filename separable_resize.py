@@ -0,0 +1,191 @@
+# 
+# separable_resize.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+separable_resize.py
+-----------------------------
+The Separable Resize module is the resize engine of the Separable backend of the EXO Image Rescale Node. A resize is split into a vertical and a horizontal pass, each a set of matrix multiplications with precomputed resampling weights, over the whole image batch and all channels at once.
+
+Features:
+- PIL Weights: The Lanczos, bicubic, bilinear and nearest weights are computed like PIL computes its resampling coefficients (including the wider filter when shrinking), so results match PIL without its 8-bit rounding between passes.
+- Banded Blocks: Resampling weights are only non-zero near the diagonal, so each weight matrix is stored as blocks of output rows with the input range they read, and applied as one small matmul per block instead of one large mostly-zero matmul.
+- Weight Cache: The blocks of every (source size, target size, filter) are kept in a least recently used cache with a byte budget (see lru_cache), so repeated resizes skip computing the weights.
+"""
+
+import numpy as np
+import torch
+
+from .lru_cache import LRUCache
+from .functions import calculate_target_size, supersample_factor, SUPERSAMPLE_FACTOR, DEFAULT_SUPERSAMPLE_MEMORY_MB
+
+# Output rows per weight block
+BLOCK_ROWS = 64
+
+# Default byte budget of the weight cache
+DEFAULT_WEIGHT_CACHE_MB = 128
+
+
+def _bilinear(x):
+    x = np.abs(x)
+    return np.where(x < 1.0, 1.0 - x, 0.0)
+
+
+def _bicubic(x, a=-0.5):
+    x = np.abs(x)
+    return np.where(x < 1.0, ((a + 2.0) * x - (a + 3.0)) * x * x + 1.0,
+                    np.where(x < 2.0, (((x - 5.0) * x + 8.0) * x - 4.0) * a, 0.0))
+
+
+def _lanczos(x):
+    return np.where(np.abs(x) < 3.0, np.sinc(x) * np.sinc(x / 3.0), 0.0)
+
+
+# Resampling filters and their support radius, as in PIL
+FILTERS = {'bilinear': (_bilinear, 1.0), 'bicubic': (_bicubic, 2.0), 'lanczos': (_lanczos, 3.0)}
+
+
+def resample_weights(in_size, out_size, resample='bicubic'):
+    """
+    Return (first input index, weights) per output pixel: an [out_size] int array and an [out_size, taps] float array.
+    Output pixel i is sum(weights[i, k] * input[first[i] + k]).
+    """
+    scale = in_size / out_size
+    centers = (np.arange(out_size) + 0.5) * scale
+    if resample.lower() == 'nearest':
+        # PIL steps the source position by repeated addition; the running sum picks the same pixels
+        positions = np.cumsum(np.concatenate([[scale * 0.5], np.full(out_size - 1, scale)]))
+        first = np.minimum(positions.astype(np.int64), in_size - 1)
+        return first, np.ones((out_size, 1), dtype=np.float32)
+
+    kernel, support = FILTERS[resample.lower()]
+    # Shrinking widens the filter so every input pixel contributes
+    filter_scale = max(scale, 1.0)
+    support *= filter_scale
+    first = np.maximum((centers - support + 0.5).astype(np.int64), 0)
+    last = np.minimum((centers + support + 0.5).astype(np.int64), in_size)
+    taps = int((last - first).max())
+    positions = first[:, None] + np.arange(taps)[None, :]
+    weights = kernel((positions - centers[:, None] + 0.5) / filter_scale)
+    weights = np.where(positions < last[:, None], weights, 0.0)
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals != 0)
+    return first, weights.astype(np.float32)
+
+
+def weight_blocks(in_size, out_size, resample='bicubic'):
+    """
+    Return the resampling weights as a tuple of (out start, out end, in start, in end, [rows, in range] matrix) blocks.
+    """
+    first, weights = resample_weights(in_size, out_size, resample)
+    taps = weights.shape[1]
+    blocks = []
+    for start in range(0, out_size, BLOCK_ROWS):
+        end = min(out_size, start + BLOCK_ROWS)
+        in_start = int(first[start:end].min())
+        in_end = min(in_size, int(first[start:end].max()) + taps)
+        block = np.zeros((end - start, in_end - in_start), dtype=np.float32)
+        rows = np.repeat(np.arange(end - start), taps)
+        columns = (first[start:end, None] + np.arange(taps)[None, :] - in_start).reshape(-1)
+        valid = columns < in_end - in_start
+        np.add.at(block, (rows[valid], columns[valid]), weights[start:end].reshape(-1)[valid])
+        blocks.append((start, end, in_start, in_end, torch.from_numpy(block)))
+    return tuple(blocks)
+
+
+class WeightCache(LRUCache):
+    """LRU of weight blocks keyed by (in size, out size, filter), bounded by budget_mb."""
+
+    def __init__(self, budget_mb=DEFAULT_WEIGHT_CACHE_MB):
+        super().__init__(budget_mb)
+
+    def get(self, in_size, out_size, resample):
+        key = (in_size, out_size, resample.lower())
+        blocks = self.lookup(key)
+        if blocks is None:
+            blocks = weight_blocks(in_size, out_size, resample)
+            self.store(key, blocks, sum(block.numel() * block.element_size() for *_, block in blocks), replace=False)
+        return blocks
+
+
+# Cache shared by every resize
+weight_cache = WeightCache()
+
+
+def _resample_rows(samples, blocks, out_size):
+    # Resample dim -2 of [..., rows, columns] samples with one matmul per weight block
+    output = samples.new_empty(samples.shape[:-2] + (out_size, samples.shape[-1]))
+    for start, end, in_start, in_end, block in blocks:
+        torch.matmul(block, samples[..., in_start:in_end, :], out=output[..., start:end, :])
+    return output
+
+
+def separable_resize(samples, new_width, new_height, resample='bicubic'):
+    """Resize [B,C,H,W] 0-1 float samples to new_height x new_width with two passes of precomputed weights."""
+    height, width = samples.shape[-2], samples.shape[-1]
+    vertical = weight_cache.get(height, new_height, resample) if new_height != height else None
+    horizontal = weight_cache.get(width, new_width, resample) if new_width != width else None
+
+    def resize_vertical(x):
+        return _resample_rows(x, vertical, new_height) if vertical is not None else x
+
+    def resize_horizontal(x):
+        return _resample_rows(x.transpose(-1, -2), horizontal, new_width).transpose(-1, -2) if horizontal is not None else x
+
+    # Horizontal pass first, clamped to 0-1 like PIL's 8-bit intermediate, so overshoot is clipped the same way
+    return resize_vertical(resize_horizontal(samples).clamp(0.0, 1.0))
+
+
+def separable_rescale_steps(new_width, new_height, batch_size, channels, supersample_aa='true', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB):
+    # Number of separable_resize calls (progress steps) of separable_rescale_image
+    if supersample_aa in ('pyramid', 'tiled'):
+        return supersample_factor(new_width, new_height, batch_size * channels * 4, memory_mb).bit_length()
+    return 2 if supersample_aa == 'true' else 1
+
+
+def separable_rescale_image(images: torch.Tensor, mode='resize', force_resize=False, supersample_aa='true', factor: float = 2.0, width: int = 1024, height: int = 1024, resample='bicubic', memory_mb=DEFAULT_SUPERSAMPLE_MEMORY_MB, progress_callback=None, out=None):
+    # Rescale a whole [B,H,W,C] image batch with separable_resize, like torch_rescale_image.
+    # Every resize is one progress step (see separable_rescale_steps). With out the result is copied into it.
+    original_height, original_width = images.shape[1], images.shape[2]
+    new_width, new_height = calculate_target_size(original_width, original_height, mode, force_resize, factor, width, height)
+
+    def resize(samples, scale):
+        samples = separable_resize(samples, new_width * scale, new_height * scale, resample)
+        if progress_callback:
+            progress_callback.update(1)
+        return samples
+
+    samples = images.movedim(-1, 1).float()
+    if supersample_aa == 'true':
+        samples = resize(samples, SUPERSAMPLE_FACTOR)
+    elif supersample_aa in ('pyramid', 'tiled'):
+        # Capped pyramid for the whole batch (float32 samples), as in the torch path
+        scale = supersample_factor(new_width, new_height, samples.shape[0] * samples.shape[1] * 4, memory_mb)
+        while scale > 1:
+            samples = resize(samples, scale)
+            scale //= 2
+    samples = resize(samples, 1).clamp(0.0, 1.0).movedim(1, -1)
+    if out is not None:
+        return out.copy_(samples)
+    return samples.contiguous()
@@ -0,0 +1,201 @@
+# 
+# translate_backends.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+translate_backends.py
+-----------------------------
+The Translate Backends module is used with the EXO Translate Text Node to run the cached MarianMT models on different inference runtimes. Every backend loads a model from its directory in translate_models/ and translates a batch of text chunks.
+
+Backends:
+- Transformers: The default Hugging Face transformers runtime, loading memory-mapped safetensors weights.
+- CTranslate2: Converts the cached model once to CTranslate2 and runs it with int8 weights on CPU. Requires the ctranslate2 package.
+- ONNX Runtime: Exports the cached model once to ONNX and runs it with ONNX Runtime. Requires the optimum and onnxruntime packages.
+
+Converted models are stored next to the original model directory and reused on later runs.
+"""
+
+import os
+import shutil
+import threading
+from importlib.util import find_spec
+
+# CTranslate2 compute type used on CPU; int8 weights give the largest speedup for Marian sized models
+CT2_COMPUTE_TYPE = "int8"
+
+
+def convert_once(converted_path, convert, description):
+    """
+    Run convert(output_path) unless converted_path already exists.
+    The conversion is written to a temporary directory and renamed into place, so worker
+    processes converting the same model at the same time never see a partial result.
+    """
+    if os.path.exists(converted_path):
+        return converted_path
+    print(f"\033[94m{description} (one time only)...\033[0m")
+    temp_path = f"{converted_path}.tmp{os.getpid()}"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    convert(temp_path)
+    try:
+        os.rename(temp_path, converted_path)
+    except OSError:
+        # Another process finished first
+        shutil.rmtree(temp_path, ignore_errors=True)
+        if not os.path.exists(converted_path):
+            raise
+    return converted_path
+
+
+class TranslationBackend:
+    """Base class for translation backends. Subclasses load a model directory and translate batches of chunks."""
+    name = None
+    requires = ()
+
+    @classmethod
+    def is_available(cls):
+        """True when every package the backend needs is installed."""
+        return all(find_spec(module) is not None for module in cls.requires)
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+    def translate(self, chunks):
+        """Translate a list of text chunks and return the translations in the same order."""
+        raise NotImplementedError
+
+
+class TransformersBackend(TranslationBackend):
+    name = "Transformers"
+    requires = ("transformers",)
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        from transformers import MarianTokenizer
+        if __package__:
+            from .translate_model_store import load_model
+        else:
+            # Loaded top-level by the worker script or the benchmarks
+            from translate_model_store import load_model
+        self.model = load_model(model_path)
+        self.tokenizer = MarianTokenizer.from_pretrained(model_path)
+
+    def translate(self, chunks):
+        import torch
+        if not chunks:
+            return []
+        with torch.inference_mode():
+            inputs = self.tokenizer(chunks, return_tensors="pt", padding=True, truncation=True)
+            translated = self.model.generate(**inputs)
+        return self.tokenizer.batch_decode(translated, skip_special_tokens=True)
+
+
+class CTranslate2Backend(TranslationBackend):
+    name = "CTranslate2"
+    requires = ("ctranslate2", "transformers")
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        import ctranslate2
+        from transformers import MarianTokenizer
+        converted_path = convert_once(
+            model_path + ".ct2",
+            lambda output_path: ctranslate2.converters.TransformersConverter(model_path).convert(output_path),
+            f"Converting '{os.path.basename(model_path)}' to CTranslate2",
+        )
+        self.translator = ctranslate2.Translator(converted_path, device="cpu", compute_type=CT2_COMPUTE_TYPE)
+        self.tokenizer = MarianTokenizer.from_pretrained(model_path)
+
+    def translate(self, chunks):
+        if not chunks:
+            return []
+        source = [self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(chunk, truncation=True)) for chunk in chunks]
+        results = self.translator.translate_batch(source)
+        return [
+            self.tokenizer.decode(self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+            for result in results
+        ]
+
+
+class OnnxRuntimeBackend(TranslationBackend):
+    name = "ONNX Runtime"
+    requires = ("optimum", "onnxruntime", "transformers")
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        from transformers import MarianTokenizer
+        converted_path = convert_once(
+            model_path + ".onnx",
+            lambda output_path: ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True).save_pretrained(output_path),
+            f"Exporting '{os.path.basename(model_path)}' to ONNX",
+        )
+        self.model = ORTModelForSeq2SeqLM.from_pretrained(converted_path)
+        self.tokenizer = MarianTokenizer.from_pretrained(model_path)
+
+    def translate(self, chunks):
+        if not chunks:
+            return []
+        inputs = self.tokenizer(chunks, return_tensors="pt", padding=True, truncation=True)
+        translated = self.model.generate(**inputs)
+        return self.tokenizer.batch_decode(translated, skip_special_tokens=True)
+
+
+# Dictionary mapping backend names to their classes; the first entry is the default
+TRANSLATION_BACKENDS = {
+    backend.name: backend for backend in (TransformersBackend, CTranslate2Backend, OnnxRuntimeBackend)
+}
+DEFAULT_BACKEND = TransformersBackend.name
+
+# Loaded backends shared by every node instance, keyed by (backend name, model path)
+_loaded_backends = {}
+_loaded_lock = threading.Lock()
+
+
+def available_backends():
+    """Return the names of the backends whose packages are installed."""
+    return [name for name, backend in TRANSLATION_BACKENDS.items() if backend.is_available()]
+
+
+def load_backend(name, model_path):
+    """
+    Return a loaded backend for the model stored at model_path.
+    Backends are loaded once and shared, so later executions reuse the warm model.
+    """
+    if name not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Unknown translation backend: {name}")
+    backend_class = TRANSLATION_BACKENDS[name]
+    if not backend_class.is_available():
+        raise RuntimeError(f"The {name} backend requires: {', '.join(backend_class.requires)}")
+    key = (name, model_path)
+    with _loaded_lock:
+        if key not in _loaded_backends:
+            _loaded_backends[key] = backend_class(model_path)
+        return _loaded_backends[key]
+
+
+def unload_backends(model_path):
+    """Drop every loaded backend for the model stored at model_path."""
+    with _loaded_lock:
+        for key in [key for key in _loaded_backends if key[1] == model_path]:
+            del _loaded_backends[key]
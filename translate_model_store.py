@@ -0,0 +1,219 @@
+# 
+# translate_model_store.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+translate_model_store.py
+-----------------------------
+The Translate Model Store module manages the translate_models/ directory used by the EXO Translate Text Node. Every model is stored as safetensors together with a manifest.json that records the size and SHA-256 checksum of each file.
+
+Features:
+- Safetensors Storage: Models are always saved as model.safetensors; older pytorch_model.bin downloads are converted once.
+- Atomic Saves: Models are written to a temporary directory and renamed into place, so an interrupted download never leaves a half-written model behind.
+- Integrity Manifest: File sizes are checked on every load and checksums once per process; a damaged model is reported so it can be downloaded again.
+- Memory-Mapped Loading: Weights are mapped straight from model.safetensors instead of being read into memory, so loading is near zero-copy and worker processes share the same weight pages.
+"""
+
+import os
+import json
+import shutil
+import struct
+import hashlib
+import threading
+
+MANIFEST_NAME = "manifest.json"
+WEIGHTS_NAME = "model.safetensors"
+LEGACY_WEIGHTS_NAME = "pytorch_model.bin"
+
+# safetensors dtype names; resolved to torch dtypes lazily so this module imports without torch
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+# Model directories whose checksums were verified by this process
+_verified_paths = set()
+_verified_lock = threading.Lock()
+
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _store_files(model_path):
+    for root, _, files in os.walk(model_path):
+        for name in files:
+            if name != MANIFEST_NAME:
+                yield os.path.relpath(os.path.join(root, name), model_path).replace(os.sep, "/")
+
+
+def write_manifest(model_path):
+    """Record the size and SHA-256 checksum of every file in the model directory."""
+    files = {}
+    for name in sorted(_store_files(model_path)):
+        file_path = os.path.join(model_path, name)
+        files[name] = {"size": os.path.getsize(file_path), "sha256": _file_sha256(file_path)}
+    with open(os.path.join(model_path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump({"format": "safetensors", "files": files}, f, indent=4)
+
+
+def verify_manifest(model_path, full=False):
+    """
+    Check the model directory against its manifest.
+
+    Args:
+        model_path (str): The model directory
+        full (bool): Also compare SHA-256 checksums, not only file sizes
+
+    Returns:
+        list: Descriptions of the problems found; empty when the model is intact
+    """
+    try:
+        with open(os.path.join(model_path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return [f"unreadable manifest: {e}"]
+
+    problems = []
+    for name, entry in manifest.get("files", {}).items():
+        file_path = os.path.join(model_path, name)
+        if not os.path.isfile(file_path):
+            problems.append(f"missing file: {name}")
+        elif os.path.getsize(file_path) != entry["size"]:
+            problems.append(f"size mismatch: {name}")
+        elif full and _file_sha256(file_path) != entry["sha256"]:
+            problems.append(f"checksum mismatch: {name}")
+    return problems
+
+
+def save_model(model, tokenizer, model_path):
+    """Save a model and tokenizer as safetensors with a manifest, replacing the directory atomically."""
+    temp_path = f"{model_path}.tmp{os.getpid()}"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    model.save_pretrained(temp_path, safe_serialization=True)
+    tokenizer.save_pretrained(temp_path)
+    write_manifest(temp_path)
+    shutil.rmtree(model_path, ignore_errors=True)
+    os.rename(temp_path, model_path)
+    with _verified_lock:
+        _verified_paths.add(model_path)
+
+
+def _migrate_legacy_weights(model_path):
+    """Convert a pytorch_model.bin download to safetensors."""
+    from transformers import MarianMTModel, MarianTokenizer
+    print(f"\033[94mConverting '{os.path.basename(model_path)}' to safetensors (one time only)...\033[0m")
+    model = MarianMTModel.from_pretrained(model_path)
+    tokenizer = MarianTokenizer.from_pretrained(model_path)
+    save_model(model, tokenizer, model_path)
+
+
+def prepare_model_store(model_path):
+    """
+    Make sure a cached model directory is in the safetensors store format and intact.
+    Legacy downloads are converted and given a manifest. Checksums are verified once per process.
+
+    Returns:
+        list: Descriptions of the problems found; empty when the model is ready to load
+    """
+    has_weights = os.path.isfile(os.path.join(model_path, WEIGHTS_NAME))
+    if not has_weights and os.path.isfile(os.path.join(model_path, LEGACY_WEIGHTS_NAME)):
+        _migrate_legacy_weights(model_path)
+    elif not os.path.isfile(os.path.join(model_path, MANIFEST_NAME)):
+        if not has_weights:
+            return [f"missing file: {WEIGHTS_NAME}"]
+        # Model saved before manifests existed; trust it as it is now
+        write_manifest(model_path)
+
+    with _verified_lock:
+        full = model_path not in _verified_paths
+    problems = verify_manifest(model_path, full=full)
+    if not problems:
+        with _verified_lock:
+            _verified_paths.add(model_path)
+    return problems
+
+
+def load_safetensors_mmap(file_path):
+    """
+    Load a safetensors file as a state dict whose tensors are views of a private memory map of the file.
+    Pages are only read when used and are shared with every other process mapping the same file.
+    """
+    import torch
+    with open(file_path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    data_start = 8 + header_size
+    nbytes = os.path.getsize(file_path)
+    storage = torch.UntypedStorage.from_file(file_path, shared=False, nbytes=nbytes)
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        offset = data_start + begin
+        tensor = torch.empty(0, dtype=dtype)
+        element_size = tensor.element_size()
+        if offset % element_size:
+            # Unaligned data can't be viewed in place; copy just this tensor
+            raw = torch.empty(0, dtype=torch.uint8).set_(storage, offset, (end - begin,))
+            state_dict[name] = raw.clone().view(dtype).reshape(info["shape"])
+        else:
+            state_dict[name] = tensor.set_(storage, offset // element_size, info["shape"])
+    return state_dict
+
+
+def load_model(model_path):
+    """
+    Load a MarianMT model from the store with memory-mapped weights.
+    Falls back to a regular from_pretrained load if the weights can't be mapped onto the model.
+    """
+    import torch
+    from transformers import MarianConfig, MarianMTModel
+
+    weights_path = os.path.join(model_path, WEIGHTS_NAME)
+    try:
+        state_dict = load_safetensors_mmap(weights_path)
+        config = MarianConfig.from_pretrained(model_path)
+        with torch.device("meta"):
+            model = MarianMTModel(config)
+        model.load_state_dict(state_dict, strict=False, assign=True)
+        model.tie_weights()
+        # Tensors that are not saved (the sinusoidal position tables) are built the way transformers builds them
+        for module in model.modules():
+            if any(t.is_meta for t in list(module.parameters(recurse=False)) + list(module.buffers(recurse=False))):
+                module.to_empty(device="cpu", recurse=False)
+                model._init_weights(module)
+        if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+            raise ValueError("weights do not cover every model tensor")
+    except Exception as e:
+        print(f"\033[93mMemory-mapped load of '{os.path.basename(model_path)}' failed ({e}); loading normally.\033[0m")
+        model = MarianMTModel.from_pretrained(model_path, use_safetensors=True)
+    return model.eval()
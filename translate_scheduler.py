@@ -0,0 +1,206 @@
+# 
+# translate_scheduler.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+translate_scheduler.py
+-----------------------------
+The Translate Scheduler module is used with the EXO Translate Text Node to coalesce translation requests. Chunks submitted for the same model within a short window are gathered into one padded batch, up to a maximum batch size, and each caller's future receives its own translations once the batch is done. Many small requests then cost a few large generate calls instead of many tiny ones.
+
+A caller that submits several requests at once (e.g. a list-mode batch) holds the scheduler while it submits, so they are batched together and dispatched as soon as the hold ends. The window is 0 by default, so a lone request is translated without waiting; a longer window also gathers requests from other threads.
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Default coalescing window and batch size limit
+DEFAULT_WINDOW_MS = 0
+DEFAULT_MAX_BATCH_SIZE = 32
+
+
+class _Request:
+    """One caller's chunks; resolves its future when every chunk has been translated."""
+
+    def __init__(self, chunks):
+        self.future = Future()
+        self.results = [None] * len(chunks)
+        self.remaining = len(chunks)
+        self._lock = threading.Lock()
+
+    def set_result(self, index, translation):
+        # A request split over several batches may be completed from more than one thread
+        with self._lock:
+            self.results[index] = translation
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done and not self.future.done():
+            self.future.set_result(self.results)
+
+    def set_exception(self, error):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class _ModelQueue:
+    """Pending chunks for one model, with the runner that translates them."""
+
+    def __init__(self, runner, concurrency):
+        self.runner = runner
+        self.concurrency = concurrency
+        self.pending = deque()
+        self.first_arrival = None
+        self.in_flight = 0
+
+
+class MicroBatchScheduler:
+    """
+    Coalesces chunk requests per model key.
+    A batch is dispatched when max_batch_size chunks are waiting or the oldest waiting chunk
+    has waited window_ms, whichever comes first, but not while a caller holds the scheduler (see hold).
+    """
+
+    def __init__(self, window_ms=DEFAULT_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_workers=16):
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self._queues = {}
+        self._holds = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="EXOTranslateBatch")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="EXOTranslateScheduler", daemon=True)
+        self._dispatcher.start()
+
+    def configure(self, window_ms=None, max_batch_size=None):
+        """Change the coalescing window and batch size limit for batches dispatched from now on."""
+        with self._condition:
+            if window_ms is not None:
+                self.window_ms = max(0, window_ms)
+            if max_batch_size is not None:
+                self.max_batch_size = max(1, max_batch_size)
+            self._condition.notify()
+
+    @contextmanager
+    def hold(self):
+        """Defer dispatching (except full batches) until the block ends, so requests submitted in it are batched together."""
+        with self._condition:
+            self._holds += 1
+        try:
+            yield self
+        finally:
+            with self._condition:
+                self._holds -= 1
+                self._condition.notify()
+
+    def submit(self, key, runner, chunks, concurrency=1):
+        """
+        Queue chunks for translation.
+
+        Args:
+            key: Identifies the model; only chunks with the same key are batched together
+            runner (callable): Translates a list of chunks and returns the translations in order
+            chunks (list): The text chunks to translate
+            concurrency (int): How many batches for this key may run at the same time
+
+        Returns:
+            Future: Resolves to the list of translations for these chunks, in order.
+        """
+        request = _Request(chunks)
+        if not chunks:
+            request.future.set_result([])
+            return request.future
+        with self._condition:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = _ModelQueue(runner, concurrency)
+            queue.runner = runner
+            queue.concurrency = max(1, concurrency)
+            if not queue.pending:
+                queue.first_arrival = time.monotonic()
+            queue.pending.extend((request, index, chunk) for index, chunk in enumerate(chunks))
+            self._condition.notify()
+        return request.future
+
+    def _dispatch_loop(self):
+        with self._condition:
+            while True:
+                timeout = None
+                now = time.monotonic()
+                for queue in self._queues.values():
+                    if not queue.pending or queue.in_flight >= queue.concurrency:
+                        continue
+                    full = len(queue.pending) >= self.max_batch_size
+                    if self._holds and not full:
+                        # Dispatched when the hold ends
+                        continue
+                    deadline = queue.first_arrival + self.window_ms / 1000.0
+                    if full or now >= deadline:
+                        self._start_batch(queue)
+                        if queue.pending and queue.in_flight < queue.concurrency:
+                            timeout = 0
+                    else:
+                        wait = deadline - now
+                        timeout = wait if timeout is None else min(timeout, wait)
+                if timeout != 0:
+                    self._condition.wait(timeout)
+
+    def _start_batch(self, queue):
+        size = min(len(queue.pending), self.max_batch_size)
+        batch = [queue.pending.popleft() for _ in range(size)]
+        # Chunks left behind have already waited out their window and go in the next batch
+        if not queue.pending:
+            queue.first_arrival = None
+        queue.in_flight += 1
+        self._executor.submit(self._run_batch, queue, batch)
+
+    def _run_batch(self, queue, batch):
+        try:
+            translations = queue.runner([chunk for _, _, chunk in batch])
+            if len(translations) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} translations, got {len(translations)}.")
+            for (request, index, _), translation in zip(batch, translations):
+                request.set_result(index, translation)
+        except Exception as e:
+            for request, _, _ in batch:
+                request.set_exception(e)
+        finally:
+            with self._condition:
+                queue.in_flight -= 1
+                self._condition.notify()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(window_ms=DEFAULT_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """Return the shared scheduler, creating it on first use and applying the given settings."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = MicroBatchScheduler(window_ms, max_batch_size)
+        else:
+            _scheduler.configure(window_ms, max_batch_size)
+        return _scheduler
@@ -0,0 +1,227 @@
+# 
+# translate_worker.py
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License v3.0 as published
+# by the Free Software Foundation.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# The GPL license ensures that any derivative work based on GPL-licensed code
+# must also be distributed under the same GPL license terms. This means that if
+# you modify GPL-licensed software and distribute your modified version, you must
+# also provide the source code and allow others to modify and distribute it under
+# the same GPL license.
+# 
+# A copy of the GNU General Public License is included within these project files.
+# 
+# Date: Dec.17.2024
+# Author: Joe Porter / AKA: xfgexo
+# Contact: exo@xfgclan.com
+# URL Link: https://github.com/xfgexo/EXO-Custom-ComfyUI-Nodes
+
+"""
+translate_worker.py
+-----------------------------
+The Translate Worker module is used with the EXO Translate Text Node to run MarianMT translation outside of the ComfyUI server process. A small pool of worker processes is started on first use; each worker keeps the models it has loaded warm and receives batched chunk requests from a shared queue, so translation scales across CPU cores and never competes with the server for the GIL.
+
+The same file is both the pool (imported by the node) and the worker (run as a script by the pool), so the worker never has to import ComfyUI or this package.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+# Sentinel placed on the task queue to stop a feeder thread
+_STOP = object()
+
+
+class TranslationWorkerPool:
+    """
+    A pool of translation worker processes.
+    Requests are placed on a shared queue; one feeder thread per worker pulls the next request,
+    sends it to its process and resolves the caller's future with the reply.
+    """
+
+    def __init__(self, num_workers, threads_per_worker=None):
+        self.num_workers = max(1, int(num_workers))
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.threads_per_worker = threads_per_worker
+        self._tasks = queue.Queue()
+        self._ids = itertools.count()
+        self._closed = False
+        self._processes = []
+        self._threads = []
+
+        for index in range(self.num_workers):
+            process = subprocess.Popen(
+                [sys.executable, WORKER_SCRIPT, str(self.threads_per_worker)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                encoding="utf-8",
+            )
+            thread = threading.Thread(target=self._feed, args=(process,), name=f"EXOTranslateWorker-{index}", daemon=True)
+            thread.start()
+            self._processes.append(process)
+            self._threads.append(thread)
+
+    @property
+    def alive(self):
+        """True while the pool accepts work and every worker process is running."""
+        return not self._closed and all(process.poll() is None for process in self._processes)
+
+    def submit(self, model_path, chunks, backend):
+        """
+        Queue a batch of chunks for translation with the model stored at model_path,
+        run by the named backend from translate_backends.
+
+        Returns:
+            Future: Resolves to the list of translated chunks, in input order.
+        """
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Translation worker pool has been shut down."))
+            return future
+        self._tasks.put((next(self._ids), model_path, backend, list(chunks), future))
+        return future
+
+    def translate(self, model_path, chunks, backend):
+        """Translate a batch of chunks and block until the result is available."""
+        if not chunks:
+            return []
+        return self.submit(model_path, chunks, backend).result()
+
+    def shutdown(self):
+        """Stop the feeder threads and terminate the worker processes. Safe to call more than once."""
+        self._closed = True
+        for _ in self._threads:
+            self._tasks.put(_STOP)
+        for process in self._processes:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+        for process in self._processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _feed(self, process):
+        while True:
+            task = self._tasks.get()
+            if task is _STOP:
+                return
+            request_id, model_path, backend, chunks, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                process.stdin.write(json.dumps({"id": request_id, "model_path": model_path, "backend": backend, "chunks": chunks}) + "\n")
+                process.stdin.flush()
+                line = process.stdout.readline()
+                if not line:
+                    try:
+                        exit_code = process.wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        exit_code = process.wait()
+                    raise RuntimeError(f"Translation worker exited unexpectedly (exit code {exit_code}).")
+                reply = json.loads(line)
+                if reply.get("error"):
+                    raise RuntimeError(reply["error"])
+                future.set_result(reply["translations"])
+            except (OSError, ValueError, RuntimeError) as e:
+                future.set_exception(e)
+                if process.poll() is not None:
+                    # A worker died; fail the queued work so no caller waits forever
+                    self._abort(e)
+                    return
+
+    def _abort(self, error):
+        self._closed = True
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not _STOP and task[-1].set_running_or_notify_cancel():
+                task[-1].set_exception(error)
+        for _ in self._threads:
+            self._tasks.put(_STOP)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(num_workers):
+    """
+    Return the shared worker pool, starting it on first use.
+    The pool is restarted if the requested worker count changes or a worker has died.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (not _pool.alive or _pool.num_workers != num_workers):
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            print(f"\033[94mStarting {num_workers} translation worker process(es)...\033[0m")
+            _pool = TranslationWorkerPool(num_workers)
+        return _pool
+
+
+def shutdown_worker_pool():
+    """Terminate the shared worker pool if it is running."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown_worker_pool)
+
+
+def worker_main(threads):
+    """
+    Worker process loop: reads one JSON request per line from stdin and writes one JSON reply per line.
+    Models are loaded on first use and kept warm for the lifetime of the process.
+    """
+    # Keep the protocol channel private; anything the libraries print goes to stderr
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    import torch
+    sys.path.insert(0, os.path.dirname(WORKER_SCRIPT))
+    from translate_backends import load_backend
+
+    torch.set_num_threads(threads)
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        reply = {"id": request["id"]}
+        try:
+            backend = load_backend(request["backend"], request["model_path"])
+            reply["translations"] = backend.translate(request["chunks"])
+        except Exception as e:
+            reply["error"] = f"Translation worker failed: {e}"
+        channel.write(json.dumps(reply) + "\n")
+        channel.flush()
+
+
+if __name__ == "__main__":
+    worker_main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)